@@ -0,0 +1,80 @@
+from collections import defaultdict
+from typing import Dict, Iterator, List, Optional
+
+import pandas as pd
+
+
+class AddressRegistry:
+    # Constant-time lookups for the watched addresses: membership, the
+    # DataFrame rows each address sits on, its input cluster, and a dense
+    # integer id (0..n-1, in sheet order) for array-backed structures.
+
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+        self.addresses: List[str] = []
+        self.clusters: List[str] = []
+        self.row_index: List[List[int]] = []
+        self.cluster_members: Dict[str, List[str]] = defaultdict(list)
+
+    @classmethod
+    def from_dataframe(cls, df: pd.DataFrame) -> 'AddressRegistry':
+        # Column 0 holds "Cluster N:" headers followed by that cluster's addresses
+        registry = cls()
+        current_cluster = None
+        for index, address in df[0].items():
+            if pd.isna(address):
+                continue
+            if str(address).startswith('Cluster'):
+                current_cluster = address.strip(':')
+                continue
+            if current_cluster:
+                registry.register(address, index, current_cluster)
+        return registry
+
+    def register(self, address: str, row: int, cluster: str) -> int:
+        address_id = self.ids.get(address)
+        if address_id is None:
+            address_id = len(self.addresses)
+            self.ids[address] = address_id
+            self.addresses.append(address)
+            self.clusters.append(cluster)
+            self.row_index.append([])
+            self.cluster_members[cluster].append(address)
+        self.row_index[address_id].append(row)
+        return address_id
+
+    def __contains__(self, address) -> bool:
+        return address in self.ids
+
+    def __len__(self) -> int:
+        return len(self.addresses)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.addresses)
+
+    def id(self, address: str) -> Optional[int]:
+        return self.ids.get(address)
+
+    def address(self, address_id: int) -> str:
+        return self.addresses[address_id]
+
+    def rows(self, address: str) -> List[int]:
+        return self.row_index[self.ids[address]]
+
+    def cluster(self, address: str) -> str:
+        return self.clusters[self.ids[address]]
+
+    def get_value(self, df: pd.DataFrame, address: str, column):
+        return df.at[self.rows(address)[0], column]
+
+    def assign(self, df: pd.DataFrame, column, values: Dict[str, object]):
+        # Write values for many addresses in one indexed assignment
+        index = []
+        column_values = []
+        for address, value in values.items():
+            if address in self.ids:
+                rows = self.rows(address)
+                index.extend(rows)
+                column_values.extend([value] * len(rows))
+        if index:
+            df.loc[index, column] = column_values
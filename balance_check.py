@@ -1,91 +1,39 @@
-import pandas as pd
-import requests
-import time
-import json
-from tqdm import tqdm
+import os
+
+from bulk_balance import fetch_balances
+from instrumentation import metrics
+from rpc_client import RpcClient, endpoints_from_env
+from scoring import summarize_clusters
+from table_io import read_address_sheet
 
 
 SOL_THRESHOLD = 0.5 
+USE_HTTP2 = False  # needs httpx[http2]
+INPUT_FILE = os.environ.get('ADDRESS_SHEET', 'multicAIn capital DAOs.xlsx')  # .xlsx, .csv or .parquet
+METRICS_FILE = 'balance_check_metrics.json'  # .json summary, any other name for Prometheus text
+
+metrics.start_reporting(METRICS_FILE)
+metrics.mark_phase('load')
 
 
-df = pd.read_excel('multicAIn capital DAOs.xlsx', header=None)
+df = read_address_sheet(INPUT_FILE)
 
 
 df['Balance'] = ''
 df['Whitelist Recommendation'] = ''
 
-# Solana RPC endpoint
-url = "https://api.mainnet-beta.solana.com"
-
-def get_balance(address):
-    headers = {"Content-Type": "application/json"}
-    data = {
-        "jsonrpc": "2.0",
-        "id": 1,
-        "method": "getBalance",
-        "params": [address]
-    }
-    
-    response = requests.post(url, headers=headers, json=data)
-    if response.status_code == 200:
-        result = response.json()
-        if 'result' in result:
-            return result['result']['value'] / 1_000_000_000
-    return None
-
-
-cluster_stats = {}
-current_cluster = None
+# Solana RPC endpoint (SOLANA_RPC_URL overrides)
+client = RpcClient(endpoints_from_env(["https://api.mainnet-beta.solana.com"]), http2=USE_HTTP2)
 
 
 valid_rows = df[~df[0].isna() & ~df[0].astype(str).str.startswith('Cluster')].index
 
+metrics.mark_phase('balances')
+print(f"Fetching balances for {len(valid_rows)} addresses...")
+balances = fetch_balances(client.call_batch, df.loc[valid_rows, 0].astype(str).tolist())
 
-for index in tqdm(range(len(df)), desc="Processing addresses"):
-    row_value = df.at[index, 0]
-    
-
-    if pd.isna(row_value):
-        continue
-    
-  
-    if str(row_value).startswith('Cluster'):
-        current_cluster = row_value.strip(':')
-        cluster_stats[current_cluster] = {
-            'total_addresses': 0,
-            'recommended_addresses': 0,
-            'total_balance': 0,
-            'addresses_above_threshold': []
-        }
-        continue
-    
-
-    try:
-        balance = get_balance(row_value)
-        if balance is not None:
-            df.at[index, 'Balance'] = balance
-            
- 
-            cluster_stats[current_cluster]['total_addresses'] += 1
-            cluster_stats[current_cluster]['total_balance'] += balance
-            
-
-            if balance >= SOL_THRESHOLD:
-                df.at[index, 'Whitelist Recommendation'] = 'Yes'
-                cluster_stats[current_cluster]['recommended_addresses'] += 1
-                cluster_stats[current_cluster]['addresses_above_threshold'].append(row_value)
-            else:
-                df.at[index, 'Whitelist Recommendation'] = 'No'
-        else:
-            df.at[index, 'Balance'] = 'Error'
-            df.at[index, 'Whitelist Recommendation'] = 'Error'
-        
-        time.sleep(0.5)
-        
-    except Exception as e:
-        print(f"Error getting balance for {row_value}: {str(e)}")
-        df.at[index, 'Balance'] = 'Error'
-        df.at[index, 'Whitelist Recommendation'] = 'Error'
+metrics.mark_phase('scoring')
+cluster_stats = summarize_clusters(df, balances, SOL_THRESHOLD)
 
 
 print("\nCluster Analysis Summary:")
@@ -0,0 +1,230 @@
+import argparse
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+import requests
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+SCRIPTS = ['balance_check.py', 'trans_analysis.py', 'trans_analysis_async.py']
+SIZES = [1000, 10000, 100000]
+RUN_TIMEOUT = 3600  # seconds before a run is abandoned
+SAMPLE_INTERVAL = 0.05  # seconds between RSS samples
+SHEET_NAME = 'addresses.parquet'
+METRICS_NAME = 'bench_metrics.json'
+# Client-side requests per second per endpoint during runs, so the adaptive
+# limiter (tuned for public endpoints) does not set the pace against the
+# mock; --client-rate 0 keeps the scripts' own limits
+CLIENT_RATE = 10000.0
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+ABORT_MARKER = b'An error occurred'  # what the scripts print when they give up
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('localhost', 0))
+        return s.getsockname()[1]
+
+
+def start_server(addresses: int, port: int, server_args: List[str]) -> subprocess.Popen:
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(REPO_DIR, 'mock_rpc_server.py'),
+         '--addresses', str(addresses), '--port', str(port)] + server_args,
+        stdout=subprocess.DEVNULL
+    )
+    # Building a large synthetic chain takes a while; wait until it answers
+    while True:
+        if server.poll() is not None:
+            raise RuntimeError(f"mock server exited with {server.returncode}")
+        try:
+            requests.get(f'http://localhost:{port}/stats', timeout=1)
+            return server
+        except requests.exceptions.RequestException:
+            time.sleep(0.2)
+
+
+def tree_rss(process) -> int:
+    try:
+        processes = [process] + process.children(recursive=True)
+    except psutil.NoSuchProcess:
+        return 0
+    total = 0
+    for p in processes:
+        try:
+            total += p.memory_info().rss
+        except psutil.NoSuchProcess:
+            pass
+    return total
+
+
+def rate_limit_wait(metrics_path: str) -> Optional[float]:
+    # Seconds spent waiting on the client's rate limiter, summed over every
+    # request (concurrent waits in the async script add up)
+    try:
+        with open(metrics_path) as f:
+            histograms = json.load(f)['histograms']
+    except (OSError, ValueError, KeyError):
+        return None
+    return sum(entry['sum'] for entry in histograms.get('rate_limit_wait_seconds', {}).values())
+
+
+def run_script(script: str, workdir: str, env: Dict[str, str], timeout: float) -> Dict:
+    # Wall time and peak RSS of the script plus any worker processes it starts
+    log_path = os.path.join(workdir, script.replace('.py', '.log'))
+    metrics_path = os.path.join(workdir, METRICS_NAME)
+    env = dict(env, METRICS_FILE=metrics_path)
+    start = time.perf_counter()
+    with open(log_path, 'wb') as log:
+        child = subprocess.Popen([sys.executable, script], cwd=workdir, env=env,
+                                 stdout=log, stderr=subprocess.STDOUT)
+        tracked = psutil.Process(child.pid) if psutil is not None else None
+        peak_rss = 0
+        timed_out = False
+        while child.poll() is None:
+            if tracked is not None:
+                peak_rss = max(peak_rss, tree_rss(tracked))
+            if time.perf_counter() - start > timeout:
+                child.kill()
+                timed_out = True
+                break
+            time.sleep(SAMPLE_INTERVAL)
+        child.wait()
+    with open(log_path, 'rb') as log:
+        aborted = ABORT_MARKER in log.read()
+    return {
+        'wall_time': time.perf_counter() - start,
+        'peak_rss': peak_rss or None,
+        'exit_code': child.returncode,
+        'timed_out': timed_out,
+        'aborted': aborted,
+        'rate_limit_wait': rate_limit_wait(metrics_path),
+        'log': log_path
+    }
+
+
+def benchmark(sizes: List[int], scripts: List[str], server_args: List[str], timeout: float,
+              keep: bool = False, client_rate: float = CLIENT_RATE) -> List[Dict]:
+    results = []
+    for size in sizes:
+        port = free_port()
+        url = f'http://localhost:{port}/'
+        print(f"\nStarting mock server with {size} addresses on {url}", flush=True)
+        server = start_server(size, port, server_args)
+        workroot = tempfile.mkdtemp(prefix=f'bench_{size}_')
+        try:
+            sheet = os.path.join(workroot, SHEET_NAME)
+            subprocess.run([sys.executable, os.path.join(REPO_DIR, 'mock_rpc_server.py'),
+                            '--addresses', str(size), '--write-sheet', sheet] + server_args,
+                           check=True, stdout=subprocess.DEVNULL)
+
+            for script in scripts:
+                # A fresh copy per run so caches and journals from one run
+                # do not speed up the next
+                workdir = os.path.join(workroot, script.replace('.py', ''))
+                shutil.copytree(REPO_DIR, workdir, ignore=shutil.ignore_patterns(
+                    '.git', '__pycache__', '*.sqlite*', '*.pkl', '*.jsonl', '*.xlsx', '*.parquet'))
+                env = dict(os.environ, SOLANA_RPC_URL=url, ADDRESS_SHEET=sheet, PYTHONUNBUFFERED='1')
+                if client_rate:
+                    env.update(RPC_RATE=str(client_rate), RPC_MAX_RATE=str(client_rate))
+                requests.post(f'{url}stats/reset', timeout=10)
+
+                print(f"  {script}...", end=' ', flush=True)
+                result = run_script(script, workdir, env, timeout)
+                stats = requests.get(f'{url}stats', timeout=10).json()
+                result.update(
+                    script=script,
+                    addresses=size,
+                    http_requests=stats.get('http_requests', 0),
+                    rpc_calls=stats.get('rpc_calls', 0),
+                    bytes_in=stats.get('bytes_in', 0),
+                    bytes_out=stats.get('bytes_out', 0),
+                    rate_limited=stats.get('rate_limited', 0),
+                    methods=stats.get('methods', {}),
+                    requests_per_second=stats.get('http_requests', 0) / result['wall_time']
+                )
+                results.append(result)
+                print(f"{result['wall_time']:.1f}s ({run_status(result)})", flush=True)
+        finally:
+            server.terminate()
+            server.wait()
+            if keep:
+                print(f"  Working directories kept in {workroot}")
+            else:
+                shutil.rmtree(workroot, ignore_errors=True)
+    return results
+
+
+def run_status(result: Dict) -> str:
+    # A script that catches its own error can still exit 0 without results
+    if result['timed_out']:
+        return 'timeout'
+    if result['exit_code'] != 0:
+        return f"exit {result['exit_code']}"
+    return 'aborted' if result['aborted'] else 'ok'
+
+
+def format_bytes(value: Optional[int]) -> str:
+    if value is None:
+        return '-'
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if value < 1024:
+            return f"{value:.0f}{unit}"
+        value /= 1024
+    return f"{value:.1f}TB"
+
+
+def print_report(results: List[Dict]):
+    header = f"{'script':<26}{'addresses':>10}{'wall (s)':>10}{'limiter (s)':>12}{'req/s':>9}{'rpc calls':>11}{'sent':>9}{'received':>10}{'peak RSS':>10}{'429s':>6}  status"
+    print('\n' + header)
+    print('-' * len(header))
+    for r in results:
+        status = run_status(r)
+        limiter = '-' if r['rate_limit_wait'] is None else f"{r['rate_limit_wait']:.1f}"
+        print(f"{r['script']:<26}{r['addresses']:>10}{r['wall_time']:>10.1f}{limiter:>12}{r['requests_per_second']:>9.1f}"
+              f"{r['rpc_calls']:>11}{format_bytes(r['bytes_in']):>9}{format_bytes(r['bytes_out']):>10}"
+              f"{format_bytes(r['peak_rss']):>10}{r['rate_limited']:>6}  {status}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the analysis scripts end to end against mock_rpc_server.py')
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES)
+    parser.add_argument('--scripts', nargs='+', default=SCRIPTS)
+    parser.add_argument('--timeout', type=float, default=RUN_TIMEOUT)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--rate-limit', type=float, default=0.0)
+    parser.add_argument('--max-batch', type=int, default=None)
+    parser.add_argument('--client-rate', type=float, default=CLIENT_RATE,
+                        help="client-side req/s per endpoint (RPC_RATE); 0 keeps the scripts' limiter defaults")
+    parser.add_argument('--json', default=None, help='also write the results to this file')
+    parser.add_argument('--keep', action='store_true', help='keep the working directories and logs')
+    args = parser.parse_args()
+
+    if psutil is None:
+        print("psutil is not installed; peak RSS will not be reported")
+
+    server_args = ['--latency', str(args.latency), '--jitter', str(args.jitter), '--rate-limit', str(args.rate_limit)]
+    if args.max_batch is not None:
+        server_args += ['--max-batch', str(args.max_batch)]
+
+    results = benchmark(args.sizes, args.scripts, server_args, args.timeout, args.keep, args.client_rate)
+    print_report(results)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.json}")
+
+
+if __name__ == '__main__':
+    main()
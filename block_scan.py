@@ -0,0 +1,160 @@
+import asyncio
+import math
+from typing import Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
+
+from instrumentation import metrics
+
+
+# getBlock config for when only the account keys of each transaction are
+# needed: no instructions, logs or rewards are sent
+BLOCK_ACCOUNTS_CONFIG = {
+    "encoding": "json",
+    "transactionDetails": "accounts",
+    "rewards": False,
+    "maxSupportedTransactionVersion": 0,
+    "commitment": "finalized"
+}
+
+SLOT_RANGE_SIZE = 1000  # slots per work item; getBlocks allows up to 500,000
+BLOCK_BATCH_SIZE = 2  # getBlock calls per HTTP request; mainnet blocks are MBs each
+SCAN_WORKERS = 8
+BLOOM_FALSE_POSITIVE_RATE = 0.001
+SKIPPED_SLOT_ERRORS = (-32007, -32009)  # slot skipped / missing in long-term storage
+
+# Called once per transaction that touches at least one watched address,
+# with its signature, slot and the sorted watched address ids
+MatchHandler = Callable[[str, int, List[int]], None]
+
+
+class BloomFilter:
+    # Bit array with k probes from double hashing Python's str hash (so it
+    # is only valid inside one process). A miss is certain, a hit still
+    # has to be confirmed.
+
+    def __init__(self, capacity: int, false_positive_rate: float = BLOOM_FALSE_POSITIVE_RATE):
+        capacity = max(1, capacity)
+        self.size = max(8, int(-capacity * math.log(false_positive_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key: str) -> Iterator[int]:
+        h = hash(key) & 0xffffffffffffffff
+        h1, h2 = h & 0xffffffff, (h >> 32) | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, key: str):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key: str) -> bool:
+        bits = self.bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class WatchedKeys:
+    # Maps account keys seen in blocks to watched address ids. With
+    # bloom=True a Bloom filter answers the (overwhelmingly common) misses
+    # before the id table is consulted.
+
+    def __init__(self, ids: Mapping[str, int], bloom: bool = False,
+                 false_positive_rate: float = BLOOM_FALSE_POSITIVE_RATE):
+        self.ids = ids
+        self.bloom = None
+        if bloom:
+            self.bloom = BloomFilter(len(ids), false_positive_rate)
+            for key in ids:
+                self.bloom.add(key)
+
+    def match(self, keys: Iterable[str]) -> List[int]:
+        found = set()
+        for key in keys:
+            if self.bloom is not None and key not in self.bloom:
+                continue
+            address_id = self.ids.get(key)
+            if address_id is not None:
+                found.add(address_id)
+        return sorted(found)
+
+
+def block_transactions(block: Dict) -> Iterator[Tuple[str, List[str]]]:
+    # (first signature, account keys) of every transaction in a getBlock
+    # result fetched with transactionDetails "accounts"; the keys already
+    # include address-lookup-table loads
+    for entry in block.get('transactions') or ():
+        transaction = entry.get('transaction') or {}
+        keys = [key['pubkey'] if isinstance(key, dict) else key for key in transaction.get('accountKeys', ())]
+        signatures = transaction.get('signatures') or [None]
+        yield signatures[0], keys
+
+
+def slot_ranges(start_slot: int, end_slot: int, range_size: int = SLOT_RANGE_SIZE) -> List[Tuple[int, int]]:
+    # Inclusive [first, last] ranges covering start_slot..end_slot
+    return [(first, min(first + range_size - 1, end_slot)) for first in range(start_slot, end_slot + 1, range_size)]
+
+
+async def latest_slot(client) -> Optional[int]:
+    reply = await client.call_batch("getSlot", [[{"commitment": "finalized"}]])
+    if reply and isinstance(reply[0], dict) and isinstance(reply[0].get('result'), int):
+        return reply[0]['result']
+    return None
+
+
+async def scan_blocks(client, start_slot: int, end_slot: int, watched: WatchedKeys, on_match: MatchHandler,
+                      workers: int = SCAN_WORKERS, range_size: int = SLOT_RANGE_SIZE,
+                      block_batch_size: int = BLOCK_BATCH_SIZE) -> Dict[str, int]:
+    # Scans start_slot..end_slot with parallel workers, each taking one slot
+    # range at a time: getBlocks lists the slots that produced a block,
+    # then getBlock fetches them. Cost follows the width of the window,
+    # not the number of watched addresses. Returns scan counters.
+    ranges: asyncio.Queue = asyncio.Queue()
+    for slot_range in slot_ranges(start_slot, end_slot, range_size):
+        ranges.put_nowait(slot_range)
+    stats = {'blocks': 0, 'transactions': 0, 'matches': 0, 'skipped_slots': 0, 'failed_slots': 0}
+
+    async def fetch_blocks(slots: List[int]):
+        replies = await client.call_batch("getBlock", [[slot, BLOCK_ACCOUNTS_CONFIG] for slot in slots],
+                                          f"getBlock for slots {slots[0]}-{slots[-1]}")
+        by_id = {reply.get('id'): reply for reply in replies if isinstance(reply, dict)}
+        for request_id, slot in enumerate(slots):
+            reply = by_id.get(request_id)
+            if reply is None or reply.get('error'):
+                if reply is not None and reply['error'].get('code') in SKIPPED_SLOT_ERRORS:
+                    stats['skipped_slots'] += 1
+                else:
+                    stats['failed_slots'] += 1
+                continue
+            block = reply.get('result')
+            if not block:
+                stats['skipped_slots'] += 1
+                continue
+            stats['blocks'] += 1
+            for signature, keys in block_transactions(block):
+                stats['transactions'] += 1
+                address_ids = watched.match(keys)
+                if address_ids:
+                    stats['matches'] += 1
+                    on_match(signature, slot, address_ids)
+
+    async def worker():
+        while True:
+            try:
+                first, last = ranges.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            with metrics.timer('block_range_seconds'):
+                replies = await client.call_batch("getBlocks", [[first, last, {"commitment": "finalized"}]],
+                                                  f"getBlocks {first}-{last}")
+                if not replies or not isinstance(replies[0].get('result'), list):
+                    print(f"Failed to list blocks in slots {first}-{last}")
+                    stats['failed_slots'] += last - first + 1
+                    continue
+                slots = replies[0]['result']
+                stats['skipped_slots'] += (last - first + 1) - len(slots)
+                for i in range(0, len(slots), block_batch_size):
+                    await fetch_blocks(slots[i:i + block_batch_size])
+            metrics.count('block_ranges_total')
+
+    await asyncio.gather(*(worker() for _ in range(max(1, workers))))
+    for name, value in stats.items():
+        metrics.count(f'block_scan_{name}_total', value)
+    return stats
@@ -0,0 +1,127 @@
+from typing import Awaitable, Callable, Dict, Generator, List, Optional, Tuple
+
+
+LAMPORTS_PER_SOL = 1_000_000_000
+MAX_KEYS_PER_REQUEST = 100  # getMultipleAccounts hard limit
+# JSON-RPC errors meaning the endpoint does not offer getMultipleAccounts at
+# all; any other failure only sends that one chunk through getBalance
+UNSUPPORTED_METHOD_ERRORS = (-32601,)
+
+# Only the lamports field is needed, so ask for an empty data slice
+MULTIPLE_ACCOUNTS_CONFIG = {
+    "encoding": "base64",
+    "dataSlice": {"offset": 0, "length": 0}
+}
+
+
+# A caller takes (method, params_list), sends them as one JSON-RPC array and
+# returns the list of response objects (or an empty list on failure).
+RpcCaller = Callable[[str, List], List[Dict]]
+AsyncRpcCaller = Callable[[str, List], Awaitable[List[Dict]]]
+
+
+def chunked(items: List, size: int) -> List[List]:
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def _multiple_accounts_params(keys: List[str]) -> List:
+    return [[keys, MULTIPLE_ACCOUNTS_CONFIG]]
+
+
+def _context_slot(reply: Dict) -> Optional[int]:
+    return reply['result'].get('context', {}).get('slot')
+
+
+def _bulk_unsupported(responses) -> bool:
+    if not isinstance(responses, list) or not responses or not isinstance(responses[0], dict):
+        return False
+    error = responses[0].get('error')
+    return isinstance(error, dict) and error.get('code') in UNSUPPORTED_METHOD_ERRORS
+
+
+def _parse_multiple_accounts(responses, keys: List[str],
+                             slots: Optional[Dict[str, int]] = None) -> Optional[Dict[str, float]]:
+    # None means the bulk call failed and the chunk needs getBalance
+    if not isinstance(responses, list) or not responses:
+        return None
+    reply = responses[0]
+    if not isinstance(reply, dict) or 'result' not in reply or not reply['result']:
+        return None
+    accounts = reply['result'].get('value')
+    if not isinstance(accounts, list) or len(accounts) != len(keys):
+        return None
+
+    if slots is not None:
+        slots.update(dict.fromkeys(keys, _context_slot(reply)))
+
+    # Accounts that do not exist come back as null, which getBalance reports as 0
+    return {
+        key: (account['lamports'] if account else 0) / LAMPORTS_PER_SOL
+        for key, account in zip(keys, accounts)
+    }
+
+
+def _parse_balance_batch(responses, keys: List[str],
+                         slots: Optional[Dict[str, int]] = None) -> Dict[str, Optional[float]]:
+    balances = dict.fromkeys(keys)
+    if not isinstance(responses, list):
+        return balances
+
+    # Batch replies may be reordered, so match them back by id
+    for reply in responses:
+        if not isinstance(reply, dict):
+            continue
+        idx = reply.get('id')
+        if isinstance(idx, int) and 0 <= idx < len(keys) and reply.get('result'):
+            balances[keys[idx]] = reply['result']['value'] / LAMPORTS_PER_SOL
+            if slots is not None:
+                slots[keys[idx]] = _context_slot(reply)
+    return balances
+
+
+def _balance_calls(addresses: List[str], chunk_size: int,
+                   slots: Optional[Dict[str, int]]) -> Generator[Tuple[str, List], List[Dict], Dict[str, Optional[float]]]:
+    # The chunk / fallback loop shared by the blocking and asyncio versions:
+    # yields each (method, params_list) to send, is sent back the replies,
+    # and returns the balances
+    balances = {}
+    use_bulk = True
+    for keys in chunked(list(dict.fromkeys(addresses)), chunk_size):
+        chunk_balances = None
+        if use_bulk:
+            responses = yield "getMultipleAccounts", _multiple_accounts_params(keys)
+            chunk_balances = _parse_multiple_accounts(responses, keys, slots)
+            if chunk_balances is None and _bulk_unsupported(responses):
+                print("getMultipleAccounts not supported, falling back to batched getBalance")
+                use_bulk = False
+            elif chunk_balances is None:
+                print(f"getMultipleAccounts failed for {len(keys)} addresses, using getBalance for them")
+        if chunk_balances is None:
+            responses = yield "getBalance", [[key] for key in keys]
+            chunk_balances = _parse_balance_batch(responses, keys, slots)
+        balances.update(chunk_balances)
+    return balances
+
+
+def fetch_balances(call: RpcCaller, addresses: List[str],
+                   chunk_size: int = MAX_KEYS_PER_REQUEST,
+                   slots: Optional[Dict[str, int]] = None) -> Dict[str, Optional[float]]:
+    calls = _balance_calls(addresses, chunk_size, slots)
+    try:
+        request = next(calls)
+        while True:
+            request = calls.send(call(*request))
+    except StopIteration as done:
+        return done.value
+
+
+async def fetch_balances_async(call: AsyncRpcCaller, addresses: List[str],
+                               chunk_size: int = MAX_KEYS_PER_REQUEST,
+                               slots: Optional[Dict[str, int]] = None) -> Dict[str, Optional[float]]:
+    calls = _balance_calls(addresses, chunk_size, slots)
+    try:
+        request = next(calls)
+        while True:
+            request = calls.send(await call(*request))
+    except StopIteration as done:
+        return done.value
@@ -0,0 +1,210 @@
+import json
+import os
+import pickle
+import sqlite3
+import time
+from collections.abc import MutableMapping
+from typing import Iterable, Optional
+
+import numpy as np
+
+from instrumentation import metrics
+from pubkey_table import PubkeyTable
+
+
+COMMIT_INTERVAL = 500  # writes buffered before an automatic commit
+
+# Seconds an entry stays fresh; None never expires (confirmed transactions
+# cannot change, balances and signature lists can)
+TTL = {
+    'balances': 10 * 60,
+    'signatures': 6 * 60 * 60,
+    'transaction_accounts': None,
+    'cursors': None,
+}
+
+
+def _encode_json(value):
+    return json.dumps(value, separators=(',', ':'))
+
+
+def _encode_ids(value):
+    return np.asarray(value, dtype=np.int32).tobytes()
+
+
+def _decode_ids(value):
+    return np.frombuffer(value, dtype=np.int32)
+
+
+# table name -> (column type, encode, decode). Transaction accounts are
+# int32 ids into the pubkeys table, 4 bytes per account instead of ~46.
+TABLES = {
+    'balances': ('REAL', lambda value: value, lambda value: value),
+    'signatures': ('TEXT', _encode_json, json.loads),
+    'transaction_accounts': ('BLOB', _encode_ids, _decode_ids),
+    'cursors': ('TEXT', _encode_json, json.loads),
+}
+
+
+class CacheTable(MutableMapping):
+    # Dict-like view over one table; every lookup is a primary-key query,
+    # so nothing is loaded until it is asked for. Entries older than the
+    # table's TTL behave as missing, so callers re-fetch just those keys.
+
+    def __init__(self, store, name: str, ttl: Optional[float] = None):
+        self.store = store
+        self.name = name
+        self.ttl = ttl
+        _, self.encode, self.decode = TABLES[name]
+
+    def _fresh(self):
+        # SQL condition and parameters selecting entries still within the TTL
+        if self.ttl is None:
+            return "1", ()
+        return "fetched_at >= ?", (time.time() - self.ttl,)
+
+    def __getitem__(self, key):
+        condition, params = self._fresh()
+        row = self.store.conn.execute(
+            f"SELECT value FROM {self.name} WHERE key = ? AND {condition}",
+            (key,) + params).fetchone()
+        if row is None:
+            raise KeyError(key)
+        return self.decode(row[0]) if row[0] is not None else None
+
+    def __contains__(self, key):
+        condition, params = self._fresh()
+        hit = self.store.conn.execute(
+            f"SELECT 1 FROM {self.name} WHERE key = ? AND {condition}",
+            (key,) + params).fetchone() is not None
+        metrics.cache_lookup(self.name, hit)
+        return hit
+
+    def __setitem__(self, key, value):
+        self.set(key, value)
+
+    def set(self, key, value, slot: Optional[int] = None):
+        # A reply from a lagging endpoint (older slot than what we hold)
+        # must not overwrite newer data
+        self.store.write(
+            f"INSERT INTO {self.name} (key, value, slot, fetched_at) VALUES (?, ?, ?, ?) "
+            f"ON CONFLICT(key) DO UPDATE SET value = excluded.value, slot = excluded.slot, "
+            f"fetched_at = excluded.fetched_at "
+            f"WHERE excluded.slot IS NULL OR {self.name}.slot IS NULL "
+            f"OR excluded.slot >= {self.name}.slot",
+            (key, self.encode(value) if value is not None else None, slot, time.time()))
+
+    def peek(self, key, default=None):
+        # Value regardless of TTL, for merging a stale entry with new data
+        row = self.store.conn.execute(
+            f"SELECT value FROM {self.name} WHERE key = ?", (key,)).fetchone()
+        if row is None or row[0] is None:
+            return default
+        return self.decode(row[0])
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        self.store.write(f"DELETE FROM {self.name} WHERE key = ?", (key,))
+
+    def __iter__(self):
+        condition, params = self._fresh()
+        for (key,) in self.store.conn.execute(
+                f"SELECT key FROM {self.name} WHERE {condition}", params):
+            yield key
+
+    def __len__(self):
+        condition, params = self._fresh()
+        return self.store.conn.execute(
+            f"SELECT COUNT(*) FROM {self.name} WHERE {condition}", params).fetchone()[0]
+
+    def row_count(self) -> int:
+        return self.store.conn.execute(f"SELECT COUNT(*) FROM {self.name}").fetchone()[0]
+
+
+class CacheStore:
+    # SQLite-backed replacement for the pickled cache dict. Writes are
+    # single-row upserts committed in batches, so each write is O(1)
+    # instead of re-serializing the whole cache.
+
+    def __init__(self, path: str, commit_interval: int = COMMIT_INTERVAL):
+        self.path = path
+        self.commit_interval = commit_interval
+        self.pending_writes = 0
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        for name, (column_type, _, _) in TABLES.items():
+            self.conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {name} (key TEXT PRIMARY KEY, value {column_type}, "
+                f"slot INTEGER, fetched_at REAL)")
+            columns = {row[1] for row in self.conn.execute(f"PRAGMA table_info({name})")}
+            # Stores written before entries carried freshness info
+            for column, column_type in (('slot', 'INTEGER'), ('fetched_at', 'REAL')):
+                if column not in columns:
+                    self.conn.execute(f"ALTER TABLE {name} ADD COLUMN {column} {column_type}")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS pubkeys (id INTEGER PRIMARY KEY, key BLOB UNIQUE)")
+        self.pubkeys = PubkeyTable()
+        for _, key in self.conn.execute("SELECT id, key FROM pubkeys ORDER BY id"):
+            self.pubkeys.intern(key)
+        self._migrate_transaction_accounts()
+        self.conn.commit()
+        self.tables = {name: CacheTable(self, name, TTL[name]) for name in TABLES}
+
+    def _migrate_transaction_accounts(self):
+        # Stores written before interning held JSON lists of base58 addresses
+        legacy = self.conn.execute(
+            "SELECT key, value FROM transaction_accounts WHERE typeof(value) = 'text'").fetchall()
+        for signature, value in legacy:
+            self.conn.execute("UPDATE transaction_accounts SET value = ? WHERE key = ?",
+                              (_encode_ids(self.pubkey_ids(json.loads(value))), signature))
+        if legacy:
+            print(f"Converted {len(legacy)} cached transactions to interned pubkey ids")
+
+    def intern_addresses(self, addresses: Iterable[str]) -> np.ndarray:
+        # Pubkey table id per address (-1 where it is not a public key);
+        # newly interned keys are written to the store as well
+        known = len(self.pubkeys)
+        key_ids = self.pubkeys.intern_addresses(addresses)
+        for key_id in range(known, len(self.pubkeys)):
+            self.write("INSERT INTO pubkeys (id, key) VALUES (?, ?)", (key_id, self.pubkeys.key(key_id)))
+        return key_ids
+
+    def pubkey_ids(self, addresses: Iterable[str]) -> np.ndarray:
+        # Sorted table ids of the addresses that are public keys
+        key_ids = self.intern_addresses(addresses)
+        return np.unique(key_ids[key_ids >= 0])
+
+    def __getitem__(self, name: str) -> CacheTable:
+        return self.tables[name]
+
+    def __len__(self):
+        return sum(len(table) for table in self.tables.values())
+
+    def write(self, sql: str, params):
+        self.conn.execute(sql, params)
+        self.pending_writes += 1
+        if self.pending_writes >= self.commit_interval:
+            self.commit()
+
+    def commit(self):
+        with metrics.timer('cache_commit_seconds'):
+            self.conn.commit()
+        self.pending_writes = 0
+
+    def close(self):
+        self.commit()
+        self.conn.close()
+
+    def import_pickle(self, path: str) -> bool:
+        # One-off migration from the old whole-file pickle cache
+        if not os.path.exists(path) or any(table.row_count() for table in self.tables.values()):
+            return False
+        with open(path, 'rb') as f:
+            legacy = pickle.load(f)
+        # Legacy balances and signature lists carry no fetch time and would be
+        # stale anyway; only the never-expiring transaction details are kept
+        for signature, accounts in legacy.get('transaction_details', {}).items():
+            self['transaction_accounts'][signature] = self.pubkey_ids(accounts)
+        self.commit()
+        return True
@@ -0,0 +1,75 @@
+import json
+import os
+from typing import Dict, Iterator
+
+
+JOURNAL_SYNC_INTERVAL = 100  # records appended between fsyncs
+
+
+class CheckpointJournal:
+    # Append-only JSON-lines log of completed work. Progress is saved by
+    # appending one record per result instead of rewriting the whole state,
+    # and resuming replays the records to rebuild it.
+    #
+    # The first record is a header describing the run (e.g. the input it
+    # was built from); a journal whose header differs is discarded.
+
+    def __init__(self, path: str, header: Dict, sync_interval: int = JOURNAL_SYNC_INTERVAL):
+        self.path = path
+        self.header = dict(header, type='header')
+        self.sync_interval = max(1, sync_interval)
+        self.unsynced = 0
+        self.file = None
+
+    def replay(self) -> Iterator[Dict]:
+        # Yields every intact record after the header, then opens the journal
+        # for appending. A torn final line from a crash is cut off.
+        good_offset = 0
+        if os.path.exists(self.path):
+            with open(self.path, 'rb') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        break
+                    if not line.endswith(b'\n'):
+                        break
+                    if good_offset == 0 and record != self.header:
+                        print(f"Journal {self.path} belongs to a different run, starting over")
+                        break
+                    good_offset += len(line)
+                    if record.get('type') != 'header':
+                        yield record
+
+        self.file = open(self.path, 'ab')
+        self.file.truncate(good_offset)
+        if good_offset == 0:
+            self.append(self.header)
+            self.sync()
+
+    def append(self, record: Dict):
+        if self.file is None:
+            # Nothing to replay was asked for; start (or continue) the journal
+            for _ in self.replay():
+                pass
+        self.file.write(json.dumps(record, separators=(',', ':')).encode() + b'\n')
+        self.unsynced += 1
+        if self.unsynced >= self.sync_interval:
+            self.sync()
+
+    def sync(self):
+        if self.file is not None and self.unsynced:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.unsynced = 0
+
+    def close(self):
+        if self.file is not None:
+            self.sync()
+            self.file.close()
+            self.file = None
+
+    def remove(self):
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
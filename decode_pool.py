@@ -0,0 +1,77 @@
+import asyncio
+import multiprocessing
+import os
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from rpc_decode import decode_batch
+from tx_accounts import decode_account_key_bytes
+
+
+DECODE_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+
+# Set once per worker process by the pool initializer: watched 32-byte
+# pubkey -> address id
+_key_ids: Dict[bytes, int] = {}
+
+
+def _init_worker(key_ids: Dict[bytes, int]):
+    global _key_ids
+    _key_ids = key_ids
+
+
+def decode_transaction_batch(body: bytes, methods: Dict[int, str]) -> List[Tuple[int, Optional[int], bytes]]:
+    # Runs in a worker process. For every getTransaction reply that decoded,
+    # returns (request id, slot, watched address ids packed as int64) so
+    # only a few bytes per transaction travel back to the event loop.
+    replies = decode_batch(body, methods)
+    if not isinstance(replies, list):
+        return []
+    decoded = []
+    for reply in replies:
+        if not isinstance(reply, dict):
+            continue
+        result = reply.get('result')
+        keys = decode_account_key_bytes(result)
+        if keys is None:
+            continue
+        ids = array('q', sorted({_key_ids[key] for key in keys if key in _key_ids}))
+        decoded.append((reply.get('id'), result.get('slot'), ids.tobytes()))
+    return decoded
+
+
+class DecodePool:
+    # Process pool that turns raw getTransaction batch bodies into arrays of
+    # watched address ids, keeping JSON parsing off the event loop thread.
+    # Account keys are matched as raw bytes, so base64 replies never go
+    # through base58 at all.
+
+    def __init__(self, key_ids: Dict[bytes, int], workers: int = DECODE_WORKERS):
+        # fork hands the key map to workers without pickling it per task
+        # and does not re-run the calling script the way spawn would
+        context = None
+        if 'fork' in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context('fork')
+        self.workers = workers
+        self.executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(key_ids,)
+        )
+        # Start the workers now, before aiohttp creates resolver threads
+        self.executor.submit(int).result()
+
+    async def decode(self, body: bytes, methods: Dict[int, str]) -> List[Tuple[int, Optional[int], array]]:
+        loop = asyncio.get_running_loop()
+        decoded = await loop.run_in_executor(self.executor, decode_transaction_batch, body, methods)
+        results = []
+        for reply_id, slot, packed in decoded:
+            ids = array('q')
+            ids.frombytes(packed)
+            results.append((reply_id, slot, ids))
+        return results
+
+    def close(self):
+        self.executor.shutdown()
@@ -0,0 +1,118 @@
+import time
+from typing import Dict, Iterable, List, Optional
+
+
+FAILURE_THRESHOLD = 3  # consecutive failures that open the circuit
+COOLDOWN = 30.0  # seconds an open circuit waits before a probe
+INITIAL_LATENCY = 0.2  # optimistic guess so untried endpoints get traffic
+EWMA_ALPHA = 0.2
+ERROR_PENALTY = 4.0  # how strongly the error rate reduces an endpoint's weight
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class EndpointHealth:
+
+    def __init__(self, url: str):
+        self.url = url
+        self.latency = INITIAL_LATENCY
+        self.error_rate = 0.0
+        self.failures = 0
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.in_flight = 0
+
+    @property
+    def weight(self) -> float:
+        return 1.0 / (self.latency * (1.0 + ERROR_PENALTY * self.error_rate))
+
+    def expected_wait(self) -> float:
+        # Spread load proportionally to weight: a request joins the endpoint
+        # where it would wait the least given what is already in flight
+        return (self.in_flight + 1) / self.weight
+
+
+class EndpointPool:
+    # Spreads requests over every healthy endpoint, weighting each by its
+    # observed latency and error rate. Endpoints that keep failing are taken
+    # out (circuit open) and let back in after a single successful probe.
+    # The last usable endpoint is never taken out: with nowhere else to go,
+    # callers back off and keep trying it instead.
+
+    def __init__(self, endpoints: Iterable[str], failure_threshold: int = FAILURE_THRESHOLD,
+                 cooldown: float = COOLDOWN):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.endpoints: Dict[str, EndpointHealth] = {
+            url: EndpointHealth(url) for url in endpoints
+        }
+
+    def __len__(self):
+        return len(self.endpoints)
+
+    def available(self) -> List[EndpointHealth]:
+        now = time.monotonic()
+        usable = []
+        for health in self.endpoints.values():
+            if health.state == OPEN and now - health.opened_at >= self.cooldown:
+                health.state = HALF_OPEN
+            if health.state == CLOSED:
+                usable.append(health)
+            elif health.state == HALF_OPEN and health.in_flight == 0:
+                # Only one probe at a time while half open
+                usable.append(health)
+        return usable
+
+    def wait_time(self) -> float:
+        # Seconds until an open circuit is due for its probe
+        now = time.monotonic()
+        waits = [max(0.0, health.opened_at + self.cooldown - now)
+                 for health in self.endpoints.values() if health.state == OPEN]
+        return min(waits, default=0.0)
+
+    def choose(self) -> Optional[str]:
+        usable = self.available()
+        if not usable:
+            return None
+        health = min(usable, key=EndpointHealth.expected_wait)
+        health.in_flight += 1
+        return health.url
+
+    def release(self, url: str):
+        self.endpoints[url].in_flight -= 1
+
+    def record_success(self, url: str, latency: float):
+        health = self.endpoints[url]
+        health.latency += EWMA_ALPHA * (latency - health.latency)
+        health.error_rate *= 1 - EWMA_ALPHA
+        health.failures = 0
+        if health.state != CLOSED:
+            print(f"Endpoint {url} recovered")
+            health.state = CLOSED
+
+    def record_throttled(self, url: str):
+        # A 429 is the rate limiter's business; it only nudges the weight
+        health = self.endpoints[url]
+        health.error_rate += EWMA_ALPHA * (1.0 - health.error_rate) / 2
+
+    def record_failure(self, url: str):
+        health = self.endpoints[url]
+        health.error_rate += EWMA_ALPHA * (1.0 - health.error_rate)
+        health.failures += 1
+        if health.state == OPEN or (health.state != HALF_OPEN and health.failures < self.failure_threshold):
+            return
+        if not any(other.state == CLOSED for other in self.endpoints.values() if other is not health):
+            # Only endpoint left; a failed probe puts it back in rotation
+            health.state = CLOSED
+            return
+        print(f"Endpoint {url} failing, taking it out for {self.cooldown:.0f}s")
+        health.state = OPEN
+        health.opened_at = time.monotonic()
+
+    def summary(self) -> str:
+        return ', '.join(
+            f"{h.url} [{h.state}, {h.latency * 1000:.0f}ms, {h.error_rate:.0%} errors]"
+            for h in self.endpoints.values()
+        )
@@ -0,0 +1,214 @@
+import heapq
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+import numpy as np
+
+from address_registry import AddressRegistry
+from checkpoint_journal import CheckpointJournal
+from instrumentation import metrics
+from interaction_graph import InteractionGraph
+from scoring import HIGH_RISK_SCORE
+
+
+ELIGIBLE_PRIORITY = 0  # addresses that pass the balance gate and are still undecided
+NEIGHBOUR_PRIORITY = 1  # addresses reached from an undecided eligible address
+VERDICT_CHECK_ROWS = 200  # graph rows added before verdicts are recomputed
+VERDICT_CHECK_GROWTH = 1.25  # ...or this factor of the graph, whichever is larger
+
+
+class ReachSets:
+    # Union-find over address ids with each set's members kept at its root,
+    # so linking one transaction is a few finds rather than a components
+    # pass over the whole graph
+
+    def __init__(self):
+        self.parent: Dict[int, int] = {}
+        self.members: Dict[int, List[int]] = {}
+
+    def __contains__(self, node: int) -> bool:
+        return node in self.parent
+
+    def find(self, node: int) -> int:
+        root = node
+        while self.parent[root] != root:
+            root = self.parent[root]
+        # Path compression: point everything on the way straight at the root
+        while self.parent[node] != root:
+            self.parent[node], node = root, self.parent[node]
+        return root
+
+    def union(self, a: int, b: int):
+        for node in (a, b):
+            if node not in self.parent:
+                self.parent[node] = node
+                self.members[node] = [node]
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a == root_b:
+            return
+        if len(self.members[root_a]) < len(self.members[root_b]):
+            root_a, root_b = root_b, root_a
+        self.parent[root_b] = root_a
+        self.members[root_a].extend(self.members.pop(root_b))
+
+
+class BalanceGatedAnalysis:
+    # Builds the interaction graph outward from the addresses whose balance
+    # passes the gate, instead of fetching every address's history. An
+    # address below the threshold is "No" whatever the graph says, so its
+    # history is only fetched once a transaction links it to an eligible
+    # address whose verdict is still open. An eligible address is settled
+    # as soon as its group reaches high-risk size (groups only grow), or
+    # once everything linked to it has been walked; the run stops when no
+    # open verdict is left.
+    #
+    # Transactions are added to the graph once per listing address
+    # (weight 1 each), so a transaction listed by several walked addresses
+    # ends up with the same total weight as in the full run. Groups
+    # settled early get a lower-bound Risk Score. Only addresses whose own
+    # history was walked get a Risk Score at all (see `analyzed`); one that
+    # merely shows up in a fetched transaction could have any score.
+
+    def __init__(self, registry: AddressRegistry, graph: InteractionGraph, journal: CheckpointJournal,
+                 interaction_threshold: int):
+        self.registry = registry
+        self.graph = graph
+        self.journal = journal
+        self.interaction_threshold = interaction_threshold
+
+        self.address_signatures: Dict[str, List[str]] = {}
+        self.transaction_ids: Dict[str, List[int]] = {}
+        self.explored: Set[int] = set()
+        # Co-occurrence at any count among fetched transactions: which
+        # addresses an open verdict can still depend on
+        self.reach = ReachSets()
+        # Listings journaled for an address whose walk was interrupted
+        self.partial: Dict[str, Set[str]] = defaultdict(set)
+
+        self.undecided: Set[int] = set()
+        self.undecided_roots: Set[int] = set()
+        self.heap = []
+        self.queued: Set[int] = set()
+        self.sequence = 0
+        self.next_check = 0
+
+    def replay(self, record: Dict):
+        kind = record['type']
+        if kind == 'signatures':
+            self.address_signatures[record['address']] = record['signatures']
+        elif kind == 'transaction':
+            self.graph.add_transaction(record['ids'], weight=record['weight'])
+            self.transaction_ids[record['signature']] = record['ids']
+            self.partial[record['address']].add(record['signature'])
+            self._link(record['ids'])
+        elif kind == 'explored':
+            address_id = self.registry.id(record['address'])
+            self.explored.add(address_id)
+            self.partial.pop(record['address'], None)
+
+    def run(self, balances: Dict[str, float], sol_threshold: float,
+            fetch_signatures: Callable[[str], List[str]],
+            fetch_accounts: Callable[[str], Optional[Iterable[str]]]):
+        eligible = [
+            address_id for address_id, address in enumerate(self.registry.addresses)
+            if isinstance(balances.get(address), (int, float)) and balances[address] >= sol_threshold
+        ]
+        self.undecided = set(eligible)
+        self._refresh_verdicts()
+        for address_id in eligible:
+            self._queue(address_id, ELIGIBLE_PRIORITY)
+        # After a resume, addresses already linked to an open verdict
+        for root in list(self.undecided_roots):
+            for address_id in self._members(root):
+                self._queue(address_id, NEIGHBOUR_PRIORITY)
+        print(f"{len(eligible)} of {len(self.registry)} addresses pass the balance gate")
+
+        try:
+            while self.heap and self.undecided:
+                _, _, address_id = heapq.heappop(self.heap)
+                self.queued.discard(address_id)
+                if address_id in self.explored or self._root(address_id) not in self.undecided_roots:
+                    # Only settled verdicts (or none at all) depend on it; it
+                    # is queued again if it gets linked to an open one
+                    continue
+                self._explore(address_id, fetch_signatures, fetch_accounts)
+                if len(self.graph) >= self.next_check:
+                    self._refresh_verdicts()
+        finally:
+            self.journal.sync()
+
+        skipped = len(self.registry) - len(self.explored)
+        metrics.count('addresses_skipped_total', skipped)
+        print(f"Walked {len(self.explored)} addresses and {len(self.transaction_ids)} transactions; "
+              f"{skipped} address histories skipped")
+
+    def _explore(self, address_id: int, fetch_signatures, fetch_accounts):
+        address = self.registry.address(address_id)
+        signatures = self.address_signatures.get(address)
+        if signatures is None:
+            signatures = self.address_signatures[address] = fetch_signatures(address)
+            self.journal.append({'type': 'signatures', 'address': address, 'signatures': signatures})
+        counted = self.partial.pop(address, set())
+        for signature in signatures:
+            if signature in counted:
+                continue
+            ids = self.transaction_ids.get(signature)
+            if ids is None:
+                account_keys = fetch_accounts(signature) or ()
+                ids = sorted({self.registry.id(account) for account in account_keys if account in self.registry})
+                self.transaction_ids[signature] = ids
+            with metrics.timer('graph_write_seconds'):
+                self.graph.add_transaction(ids, weight=1)
+            self.journal.append({'type': 'transaction', 'signature': signature, 'ids': ids, 'weight': 1,
+                                 'address': address})
+            self._link(ids)
+        self.explored.add(address_id)
+        self.journal.append({'type': 'explored', 'address': address})
+
+    def _root(self, address_id: int) -> int:
+        return self.reach.find(address_id) if address_id in self.reach else address_id
+
+    def _members(self, root: int) -> List[int]:
+        return self.reach.members.get(root, [root])
+
+    @property
+    def analyzed(self) -> np.ndarray:
+        # Bool per address id: its history was walked
+        analyzed = np.zeros(len(self.registry), dtype=bool)
+        analyzed[list(self.explored)] = True
+        return analyzed
+
+    def _link(self, ids: List[int]):
+        if len(ids) < 2:
+            return
+        roots = {self._root(address_id) for address_id in ids}
+        open_roots = roots & self.undecided_roots
+        # Sets about to join an open verdict; their members become relevant
+        newly_open = [list(self._members(root)) for root in roots - open_roots] if open_roots else []
+        for a, b in zip(ids, ids[1:]):
+            self.reach.union(a, b)
+        if open_roots:
+            self.undecided_roots -= open_roots
+            self.undecided_roots.add(self._root(ids[0]))
+            for members in newly_open:
+                for address_id in members:
+                    self._queue(address_id, NEIGHBOUR_PRIORITY)
+
+    def _queue(self, address_id: int, priority: int):
+        if address_id in self.explored or address_id in self.queued:
+            return
+        self.queued.add(address_id)
+        self.sequence += 1
+        heapq.heappush(self.heap, (priority, self.sequence, address_id))
+
+    def _refresh_verdicts(self):
+        # An eligible address in a group of more than HIGH_RISK_SCORE is
+        # 'No (High Risk)' for good
+        if len(self.graph):
+            labels, sizes = self.graph.components(self.interaction_threshold)
+            group_sizes = sizes[labels]
+            self.undecided = {
+                address_id for address_id in self.undecided if group_sizes[address_id] <= HIGH_RISK_SCORE
+            }
+        self.undecided_roots = {self._root(address_id) for address_id in self.undecided}
+        self.next_check = max(len(self.graph) + VERDICT_CHECK_ROWS, int(len(self.graph) * VERDICT_CHECK_GROWTH))
@@ -0,0 +1,211 @@
+import atexit
+import json
+import math
+import os
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, math.inf)
+
+# Environment switches read by start_reporting()
+METRICS_FILE_ENV = 'METRICS_FILE'  # *.json for a JSON summary, anything else for Prometheus text
+PROFILE_ENV = 'PROFILE'  # 'cprofile' or 'pyinstrument'
+PROFILE_FILE_ENV = 'PROFILE_FILE'
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: Dict) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+class Histogram:
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> Optional[float]:
+        # Upper bound of the bucket holding the q-th observation
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return self.buckets[-1]
+
+
+class Metrics:
+    # Process-wide counters and latency histograms keyed by name and labels
+    # (endpoint, method, phase, ...). Recording is a dict update, cheap
+    # enough to leave on; nothing is written until report time.
+
+    def __init__(self):
+        self.counters: Dict[Tuple[str, Labels], float] = defaultdict(float)
+        self.histograms: Dict[Tuple[str, Labels], Histogram] = {}
+        self.started = time.time()
+        self.current_phase: Optional[Tuple[str, float]] = None
+
+    def count(self, name: str, amount: float = 1, **labels):
+        self.counters[(name, _labels(labels))] += amount
+
+    def observe(self, name: str, seconds: float, **labels):
+        key = (name, _labels(labels))
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = Histogram()
+        histogram.observe(seconds)
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def mark_phase(self, name: Optional[str]):
+        # Wall time of each stage of a script: ends the current phase and
+        # starts the next (None just ends it)
+        now = time.perf_counter()
+        if self.current_phase is not None:
+            previous, started = self.current_phase
+            self.observe('phase_seconds', now - started, phase=previous)
+        self.current_phase = (name, now) if name is not None else None
+
+    def cache_lookup(self, table: str, hit: bool):
+        self.count('cache_lookups_total', table=table, result='hit' if hit else 'miss')
+
+    def cache_hit_ratios(self) -> Dict[str, float]:
+        lookups = defaultdict(lambda: [0.0, 0.0])
+        for (name, labels), value in self.counters.items():
+            if name == 'cache_lookups_total':
+                labels = dict(labels)
+                lookups[labels['table']][labels['result'] == 'hit'] += value
+        return {table: hits / (hits + misses) for table, (misses, hits) in lookups.items()}
+
+    def summary(self) -> Dict:
+        counters = defaultdict(dict)
+        for (name, labels), value in sorted(self.counters.items()):
+            counters[name][_label_text(labels) or 'total'] = value
+        histograms = defaultdict(dict)
+        for (name, labels), histogram in sorted(self.histograms.items()):
+            histograms[name][_label_text(labels) or 'total'] = {
+                'count': histogram.count,
+                'sum': round(histogram.sum, 6),
+                'mean': round(histogram.sum / histogram.count, 6) if histogram.count else None,
+                'p50': _bound_value(histogram.quantile(0.5)),
+                'p95': _bound_value(histogram.quantile(0.95)),
+                'p99': _bound_value(histogram.quantile(0.99)),
+            }
+        return {
+            'uptime_seconds': round(time.time() - self.started, 3),
+            'counters': counters,
+            'histograms': histograms,
+            'cache_hit_ratio': self.cache_hit_ratios(),
+        }
+
+    def prometheus_text(self) -> str:
+        lines = []
+        for (name, labels), value in sorted(self.counters.items()):
+            lines.append(f"{name}{_prometheus_labels(labels)} {value:g}")
+        for (name, labels), histogram in sorted(self.histograms.items()):
+            cumulative = 0
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                cumulative += count
+                le = '+Inf' if bound == math.inf else f"{bound:g}"
+                lines.append(f"{name}_bucket{_prometheus_labels(labels + (('le', le),))} {cumulative}")
+            lines.append(f"{name}_sum{_prometheus_labels(labels)} {histogram.sum:.6f}")
+            lines.append(f"{name}_count{_prometheus_labels(labels)} {histogram.count}")
+        for table, ratio in sorted(self.cache_hit_ratios().items()):
+            lines.append(f"cache_hit_ratio{_prometheus_labels((('table', table),))} {ratio:.4f}")
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path: str):
+        with open(path, 'w') as f:
+            if path.endswith('.json'):
+                json.dump(self.summary(), f, indent=2)
+            else:
+                f.write(self.prometheus_text())
+
+    def start_reporting(self, metrics_file: Optional[str] = None):
+        # Writes the metrics at exit (METRICS_FILE or metrics_file) and, if
+        # PROFILE is set, profiles the whole run
+        metrics_file = os.environ.get(METRICS_FILE_ENV, metrics_file)
+        profiler = os.environ.get(PROFILE_ENV, '').lower()
+        stop_profile = None
+        if profiler == 'cprofile':
+            import cProfile
+            profile = cProfile.Profile()
+            profile.enable()
+
+            def stop_profile():
+                profile.disable()
+                path = os.environ.get(PROFILE_FILE_ENV, 'profile.pstats')
+                profile.dump_stats(path)
+                print(f"cProfile stats written to {path}")
+        elif profiler == 'pyinstrument':
+            try:
+                from pyinstrument import Profiler
+            except ImportError:
+                print("pyinstrument is not installed; running without a profiler")
+            else:
+                profile = Profiler(async_mode='enabled')
+                profile.start()
+
+                def stop_profile():
+                    profile.stop()
+                    path = os.environ.get(PROFILE_FILE_ENV, 'profile.html')
+                    with open(path, 'w') as f:
+                        f.write(profile.output_html())
+                    print(f"pyinstrument report written to {path}")
+
+        def report():
+            self.mark_phase(None)
+            if stop_profile is not None:
+                stop_profile()
+            if metrics_file:
+                self.write(metrics_file)
+                print(f"Metrics written to {metrics_file}")
+
+        atexit.register(report)
+
+
+def _label_text(labels: Labels) -> str:
+    return ','.join(f"{key}={value}" for key, value in labels)
+
+
+def _prometheus_labels(labels: Labels) -> str:
+    if not labels:
+        return ''
+    escaped = (value.replace('\\', '\\\\').replace('"', '\\"') for _, value in labels)
+    return '{' + ','.join(f'{key}="{value}"' for (key, _), value in zip(labels, escaped)) + '}'
+
+
+def payload_method(payload) -> str:
+    # Method label for a JSON-RPC request or batch
+    methods = {request.get('method') for request in payload} if isinstance(payload, list) else {payload.get('method')}
+    return methods.pop() if len(methods) == 1 else 'mixed'
+
+
+def _bound_value(bound: Optional[float]):
+    # JSON has no infinity; observations past the last finite bucket read '+Inf'
+    return '+Inf' if bound == math.inf else bound
+
+
+metrics = Metrics()
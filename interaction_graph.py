@@ -0,0 +1,83 @@
+from array import array
+from typing import Iterable, Tuple
+
+import numpy as np
+from scipy import sparse
+from scipy.sparse.csgraph import connected_components
+
+
+class InteractionGraph:
+    # Address x transaction incidence kept as flat int arrays over dense
+    # address ids. Pairwise interaction counts are the off-diagonal of
+    # A^T W A (W = per-transaction weight), computed once when needed
+    # instead of incrementing a (acc1, acc2) dict entry per pair.
+
+    def __init__(self, n_addresses: int):
+        self.n_addresses = n_addresses
+        self.tx_index = array('q')  # row (transaction) of each incidence entry
+        self.address_ids = array('q')  # column (address id) of each incidence entry
+        self.weights = array('q')  # one weight per transaction row
+        self._cooccurrence = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_cooccurrence'] = None
+        return state
+
+    def __len__(self) -> int:
+        return len(self.weights)
+
+    def add_transaction(self, address_ids: Iterable[int], weight: int = 1):
+        ids = set(address_ids)
+        if len(ids) < 2:
+            # A transaction touching a single watched address links nothing
+            return
+        row = len(self.weights)
+        self.tx_index.extend([row] * len(ids))
+        self.address_ids.extend(ids)
+        self.weights.append(weight)
+        self._cooccurrence = None
+
+    def add_pairs(self, a: np.ndarray, b: np.ndarray, counts: np.ndarray):
+        # Pre-aggregated pair counts (e.g. another graph's edges), each as a
+        # two-address row weighted by its count
+        start = len(self.weights)
+        rows = np.repeat(np.arange(start, start + len(counts), dtype=np.int64), 2)
+        self.tx_index.frombytes(rows.tobytes())
+        self.address_ids.frombytes(np.column_stack([a, b]).astype(np.int64).tobytes())
+        self.weights.frombytes(np.asarray(counts, dtype=np.int64).tobytes())
+        self._cooccurrence = None
+
+    def incidence(self) -> sparse.csr_matrix:
+        rows = np.frombuffer(self.tx_index, dtype=np.int64)
+        cols = np.frombuffer(self.address_ids, dtype=np.int64)
+        return sparse.csr_matrix(
+            (np.ones(len(rows), dtype=np.int64), (rows, cols)),
+            shape=(len(self.weights), self.n_addresses)
+        )
+
+    def cooccurrence(self) -> sparse.csr_matrix:
+        # Symmetric address x address matrix of weighted shared transactions
+        if self._cooccurrence is None:
+            incidence = self.incidence()
+            weights = sparse.diags(np.frombuffer(self.weights, dtype=np.int64), dtype=np.int64)
+            counts = (incidence.T @ weights @ incidence).tocsr()
+            counts.setdiag(0)
+            counts.eliminate_zeros()
+            self._cooccurrence = counts
+        return self._cooccurrence
+
+    def adjacency(self, threshold: int) -> sparse.csr_matrix:
+        counts = self.cooccurrence()
+        return (counts >= threshold).astype(np.int8).tocsr()
+
+    def components(self, threshold: int) -> Tuple[np.ndarray, np.ndarray]:
+        # Component label per address id and the size of each component
+        _, labels = connected_components(self.adjacency(threshold), directed=False)
+        return labels, np.bincount(labels)
+
+    def edges(self, threshold: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        # Each qualifying pair once (a < b) with its count
+        upper = sparse.triu(self.cooccurrence(), k=1).tocoo()
+        keep = upper.data >= threshold
+        return upper.row[keep], upper.col[keep], upper.data[keep]
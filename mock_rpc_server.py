@@ -0,0 +1,296 @@
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import random
+from collections import Counter
+from typing import Dict, List, Optional
+
+import pandas as pd
+from aiohttp import web
+
+from tx_accounts import PUBKEY_LENGTH, b58decode, b58encode
+
+
+DEFAULT_PORT = 8899
+DEFAULT_ADDRESSES = 1000
+TRANSACTIONS_PER_ADDRESS = 3
+CLUSTER_SIZE = 10  # watched addresses per "Cluster N:" section of the sheet
+LINK_PROBABILITY = 0.2  # chance a transaction also touches cluster neighbours
+CROSS_LINK_PROBABILITY = 0.02  # chance it touches a random other watched address
+BALANCES = [0, 10 ** 8, 3 * 10 ** 8, 2 * 10 ** 9]  # lamports
+BASE_SLOT = 250_000_000
+MAX_KEYS_PER_CALL = 100  # getMultipleAccounts limit, as on mainnet
+
+
+def _pubkey(seed: bytes) -> bytes:
+    return hashlib.sha256(seed).digest()
+
+
+def _is_pubkey(address) -> bool:
+    try:
+        return len(b58decode(address)) == PUBKEY_LENGTH
+    except (TypeError, ValueError):
+        return False
+
+
+class SyntheticChain:
+    # Deterministic stand-in for the chain data the scripts read: watched
+    # addresses with balances, and transactions linking some of them. The
+    # same seed and size always produce the same graph.
+
+    def __init__(self, n_addresses: int, seed: int = 1, transactions_per_address: int = TRANSACTIONS_PER_ADDRESS):
+        rng = random.Random(seed)
+        self.raw_keys = [_pubkey(b'watched:%d:%d' % (seed, i)) for i in range(n_addresses)]
+        self.addresses = [b58encode(key) for key in self.raw_keys]
+        self.balances = {address: rng.choice(BALANCES) for address in self.addresses}
+
+        # Transaction t lands in slot BASE_SLOT + t; each account's history
+        # is kept oldest first
+        self.transaction_keys: List[List[bytes]] = []
+        self.signatures: List[str] = []
+        self.signature_index: Dict[str, int] = {}
+        self.history: Dict[str, List[int]] = {address: [] for address in self.addresses}
+        for t in range(n_addresses * transactions_per_address):
+            primary = rng.randrange(n_addresses)
+            watched = {primary}
+            if rng.random() < LINK_PROBABILITY:
+                cluster_start = primary - primary % CLUSTER_SIZE
+                cluster_end = min(cluster_start + CLUSTER_SIZE, n_addresses)
+                watched.update(rng.sample(range(cluster_start, cluster_end), min(rng.randint(1, 2), cluster_end - cluster_start)))
+            if rng.random() < CROSS_LINK_PROBABILITY:
+                watched.add(rng.randrange(n_addresses))
+            keys = [self.raw_keys[i] for i in sorted(watched)]
+            keys.extend(_pubkey(b'other:%d:%d:%d' % (seed, t, j)) for j in range(rng.randint(1, 3)))
+
+            signature = b58encode(hashlib.sha512(b'signature:%d:%d' % (seed, t)).digest())
+            self.transaction_keys.append(keys)
+            self.signatures.append(signature)
+            self.signature_index[signature] = t
+            for i in watched:
+                self.history[self.addresses[i]].append(t)
+
+    def address_sheet(self) -> pd.DataFrame:
+        # The input format the scripts expect: "Cluster N:" headers, each
+        # followed by that cluster's addresses
+        rows = []
+        for i, address in enumerate(self.addresses):
+            if i % CLUSTER_SIZE == 0:
+                rows.append(f'Cluster {i // CLUSTER_SIZE + 1}:')
+            rows.append(address)
+        return pd.DataFrame(rows)
+
+    def balance(self, address: str) -> int:
+        return self.balances.get(address, 0)
+
+    def signatures_for_address(self, address: str, config: Dict) -> List[Dict]:
+        history = self.history.get(address, [])
+        before = self.signature_index.get(config.get('before'))
+        until = self.signature_index.get(config.get('until'))
+        page = []
+        for t in reversed(history):
+            if before is not None and t >= before:
+                continue
+            if until is not None and t <= until:
+                break
+            page.append({
+                'signature': self.signatures[t],
+                'slot': BASE_SLOT + t,
+                'err': None,
+                'memo': None,
+                'blockTime': 1_700_000_000 + t,
+                'confirmationStatus': 'finalized'
+            })
+            if len(page) >= config.get('limit', 1000):
+                break
+        return page
+
+    def transaction(self, signature: str, config: Dict) -> Optional[Dict]:
+        t = self.signature_index.get(signature)
+        if t is None:
+            return None
+        keys = self.transaction_keys[t]
+        meta = {
+            'err': None,
+            'fee': 5000,
+            'preBalances': [0] * len(keys),
+            'postBalances': [0] * len(keys),
+            'logMessages': ['Program 11111111111111111111111111111111 invoke [1]'],
+            'loadedAddresses': {'writable': [], 'readonly': []}
+        }
+        if config.get('encoding') == 'base64':
+            # Legacy wire format: one signature, header, keys, blockhash, no instructions
+            raw = bytes([1]) + bytes(64) + bytes([1, 0, 0, len(keys)]) + b''.join(keys) + bytes(32) + bytes([0])
+            transaction = [base64.b64encode(raw).decode(), 'base64']
+        else:
+            transaction = {
+                'signatures': [signature],
+                'message': {'accountKeys': [b58encode(key) for key in keys], 'instructions': []}
+            }
+        return {'slot': BASE_SLOT + t, 'blockTime': 1_700_000_000 + t, 'meta': meta, 'transaction': transaction}
+
+    def block(self, slot: int, config: Dict) -> Optional[Dict]:
+        # One transaction per slot; only the accounts-only detail level is
+        # modelled
+        t = slot - BASE_SLOT
+        if not 0 <= t < len(self.signatures):
+            return None
+        keys = self.transaction_keys[t]
+        return {
+            'blockhash': b58encode(hashlib.sha256(b'block:%d' % slot).digest()),
+            'previousBlockhash': b58encode(hashlib.sha256(b'block:%d' % (slot - 1)).digest()),
+            'parentSlot': slot - 1,
+            'blockHeight': t,
+            'blockTime': 1_700_000_000 + t,
+            'transactions': [{
+                'meta': {'err': None, 'fee': 5000, 'preBalances': [0] * len(keys), 'postBalances': [0] * len(keys)},
+                'transaction': {
+                    'accountKeys': [
+                        {'pubkey': b58encode(key), 'signer': i == 0, 'source': 'transaction', 'writable': i == 0}
+                        for i, key in enumerate(keys)
+                    ],
+                    'signatures': [self.signatures[t]]
+                }
+            }]
+        }
+
+    def blocks(self, start_slot: int, end_slot: Optional[int]) -> List[int]:
+        last = BASE_SLOT + len(self.signatures) - 1
+        end_slot = last if end_slot is None else min(end_slot, last)
+        return list(range(max(start_slot, BASE_SLOT), end_slot + 1))
+
+
+class MockRpcServer:
+    # aiohttp JSON-RPC endpoint over a SyntheticChain with optional latency,
+    # random 429s and a batch size limit. GET /stats reports traffic
+    # counters; POST /stats/reset clears them.
+
+    def __init__(self, chain: SyntheticChain, latency: float = 0.0, jitter: float = 0.0,
+                 rate_limit_probability: float = 0.0, retry_after: float = 1.0,
+                 max_batch_size: Optional[int] = None, seed: int = 1):
+        self.chain = chain
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit_probability = rate_limit_probability
+        self.retry_after = retry_after
+        self.max_batch_size = max_batch_size
+        self.rng = random.Random(seed)
+        self.stats = Counter()
+        self.methods = Counter()
+
+    def app(self) -> web.Application:
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.router.add_post('/', self.handle)
+        app.router.add_get('/stats', self.get_stats)
+        app.router.add_post('/stats/reset', self.reset_stats)
+        return app
+
+    async def get_stats(self, request: web.Request) -> web.Response:
+        return web.json_response(dict(self.stats, methods=dict(self.methods)))
+
+    async def reset_stats(self, request: web.Request) -> web.Response:
+        self.stats.clear()
+        self.methods.clear()
+        return web.json_response({'ok': True})
+
+    async def handle(self, request: web.Request) -> web.Response:
+        body = await request.read()
+        self.stats['http_requests'] += 1
+        self.stats['bytes_in'] += len(body)
+
+        if self.latency or self.jitter:
+            await asyncio.sleep(self.latency + self.rng.random() * self.jitter)
+        if self.rng.random() < self.rate_limit_probability:
+            self.stats['rate_limited'] += 1
+            return web.Response(status=429, headers={'Retry-After': str(self.retry_after)})
+
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            return self._respond({'jsonrpc': '2.0', 'id': None, 'error': {'code': -32700, 'message': 'Parse error'}})
+        if isinstance(payload, list):
+            if self.max_batch_size is not None and len(payload) > self.max_batch_size:
+                self.stats['rejected_batches'] += 1
+                return web.Response(status=413, text='Batch too large')
+            return self._respond([self.call(item) for item in payload])
+        return self._respond(self.call(payload))
+
+    def _respond(self, reply) -> web.Response:
+        text = json.dumps(reply, separators=(',', ':'))
+        self.stats['bytes_out'] += len(text)
+        return web.Response(text=text, content_type='application/json')
+
+    def call(self, request: Dict) -> Dict:
+        method = request.get('method')
+        params = request.get('params') or []
+        self.stats['rpc_calls'] += 1
+        self.methods[method] += 1
+        reply = {'jsonrpc': '2.0', 'id': request.get('id')}
+        context = {'slot': BASE_SLOT + len(self.chain.signatures)}
+
+        if method == 'getBalance':
+            reply['result'] = {'context': context, 'value': self.chain.balance(params[0])}
+        elif method == 'getMultipleAccounts':
+            if len(params[0]) > MAX_KEYS_PER_CALL:
+                reply['error'] = {'code': -32602, 'message': f'Too many inputs provided; max {MAX_KEYS_PER_CALL}'}
+            else:
+                reply['result'] = {'context': context, 'value': [
+                    {'lamports': self.chain.balances[key], 'data': ['', 'base64'], 'owner': '11111111111111111111111111111111',
+                     'executable': False, 'rentEpoch': 0, 'space': 0}
+                    if key in self.chain.balances else None
+                    for key in params[0]
+                ]}
+        elif method == 'getSignaturesForAddress':
+            if not _is_pubkey(params[0]):
+                # What a real node answers for a malformed address
+                reply['error'] = {'code': -32602, 'message': 'Invalid param: Invalid'}
+            else:
+                reply['result'] = self.chain.signatures_for_address(params[0], params[1] if len(params) > 1 else {})
+        elif method == 'getTransaction':
+            reply['result'] = self.chain.transaction(params[0], params[1] if len(params) > 1 else {})
+        elif method == 'getSlot':
+            reply['result'] = BASE_SLOT + len(self.chain.signatures) - 1
+        elif method == 'getBlocks':
+            end_slot = params[1] if len(params) > 1 and isinstance(params[1], int) else None
+            reply['result'] = self.chain.blocks(params[0], end_slot)
+        elif method == 'getBlock':
+            block = self.chain.block(params[0], params[1] if len(params) > 1 else {})
+            if block is None:
+                reply['error'] = {'code': -32009, 'message': f'Slot {params[0]} was skipped, or missing in long-term storage'}
+            else:
+                reply['result'] = block
+        else:
+            reply['error'] = {'code': -32601, 'message': 'Method not found'}
+        return reply
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local mock Solana JSON-RPC server over a synthetic graph')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--addresses', type=int, default=DEFAULT_ADDRESSES)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added to every HTTP request')
+    parser.add_argument('--jitter', type=float, default=0.0, help='extra random latency, up to this many seconds')
+    parser.add_argument('--rate-limit', type=float, default=0.0, help='probability of answering 429')
+    parser.add_argument('--retry-after', type=float, default=1.0)
+    parser.add_argument('--max-batch', type=int, default=None, help='reject JSON-RPC arrays longer than this')
+    parser.add_argument('--write-sheet', default=None, help='write the watched addresses as an input sheet and exit')
+    args = parser.parse_args()
+
+    chain = SyntheticChain(args.addresses, args.seed)
+    if args.write_sheet:
+        from table_io import write_address_sheet
+        write_address_sheet(chain.address_sheet(), args.write_sheet)
+        print(f"Wrote {len(chain.addresses)} addresses to {args.write_sheet}")
+        return
+
+    server = MockRpcServer(chain, args.latency, args.jitter, args.rate_limit,
+                           args.retry_after, args.max_batch, args.seed)
+    print(f"Serving {len(chain.addresses)} addresses and {len(chain.signatures)} transactions "
+          f"on http://localhost:{args.port}/", flush=True)
+    web.run_app(server.app(), port=args.port, print=None)
+
+
+if __name__ == '__main__':
+    main()
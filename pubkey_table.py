@@ -0,0 +1,80 @@
+from typing import Iterable, Optional, Tuple
+
+import numpy as np
+
+from tx_accounts import PUBKEY_LENGTH, b58decode
+
+
+INITIAL_SLOTS = 1024  # power of two; the index doubles past half load
+
+
+class PubkeyTable:
+    # Interns 32-byte public keys: each one is stored once, back to back in
+    # a flat byte table, and referred to everywhere else by a dense int32 id
+    # (0..n-1, in interning order). Lookups go through an open-addressing
+    # index of int32 ids that compares against the table itself, so no key
+    # is held twice: 32 bytes per key plus 8-16 bytes of index. Base58 text
+    # is only parsed on the way in (intern_address).
+
+    def __init__(self):
+        self.table = bytearray()
+        self.count = 0
+        self.index = np.full(INITIAL_SLOTS, -1, dtype=np.int32)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _find(self, key: bytes) -> Tuple[int, int]:
+        # (index slot, id) of key, or (free slot, -1). hash() is only used
+        # in-process; the index is rebuilt whenever a table is loaded.
+        mask = len(self.index) - 1
+        slot = hash(key) & mask
+        while True:
+            key_id = int(self.index[slot])
+            if key_id < 0 or self.table[key_id * PUBKEY_LENGTH:(key_id + 1) * PUBKEY_LENGTH] == key:
+                return slot, key_id
+            slot = (slot + 1) & mask
+
+    def _grow(self):
+        self.index = np.full(len(self.index) * 2, -1, dtype=np.int32)
+        for key_id in range(self.count):
+            slot, _ = self._find(self.key(key_id))
+            self.index[slot] = key_id
+
+    def intern(self, key: bytes) -> int:
+        if len(key) != PUBKEY_LENGTH:
+            raise ValueError(f"Public keys are {PUBKEY_LENGTH} bytes, got {len(key)}")
+        key = bytes(key)
+        slot, key_id = self._find(key)
+        if key_id < 0:
+            key_id = self.count
+            self.table += key
+            self.index[slot] = key_id
+            self.count += 1
+            if self.count * 2 > len(self.index):
+                self._grow()
+        return key_id
+
+    def intern_address(self, address: str) -> Optional[int]:
+        # None for text that is not a base58 public key (sheet headers, typos)
+        try:
+            key = b58decode(address)
+        except ValueError:
+            return None
+        return self.intern(key) if len(key) == PUBKEY_LENGTH else None
+
+    def intern_addresses(self, addresses: Iterable[str]) -> np.ndarray:
+        # Table id per address, -1 where it is not a public key
+        key_ids = [self.intern_address(address) for address in addresses]
+        return np.array([-1 if key_id is None else key_id for key_id in key_ids], dtype=np.int32)
+
+    def key(self, key_id: int) -> bytes:
+        return bytes(self.table[key_id * PUBKEY_LENGTH:(key_id + 1) * PUBKEY_LENGTH])
+
+    def remap(self, key_ids: np.ndarray) -> np.ndarray:
+        # Inverse of key_ids (the table id of each of some other ids, e.g.
+        # address registry ids): table id -> that id, -1 where there is none
+        lookup = np.full(len(self), -1, dtype=np.int32)
+        known = key_ids >= 0
+        lookup[key_ids[known]] = np.flatnonzero(known)
+        return lookup
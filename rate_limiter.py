@@ -0,0 +1,147 @@
+import asyncio
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, Iterable, Optional, Tuple
+
+
+DEFAULT_RATE = 5.0  # requests per second an endpoint starts at
+MIN_RATE = 0.5
+MAX_RATE = 50.0
+DECREASE_FACTOR = 0.5  # multiplicative decrease on 429
+INCREASE_STEP = 0.5  # additive increase after SUCCESS_WINDOW successes
+SUCCESS_WINDOW = 10
+
+# Requests per second overrides, e.g. for benchmarks against a local mock
+RATE_ENV = 'RPC_RATE'
+MAX_RATE_ENV = 'RPC_MAX_RATE'
+
+
+def rates_from_env(rate: Optional[float] = None, max_rate: Optional[float] = None) -> Tuple[float, float]:
+    # Explicit arguments win, then the environment, then the defaults
+    if rate is None:
+        rate = float(os.environ.get(RATE_ENV, DEFAULT_RATE))
+    if max_rate is None:
+        max_rate = float(os.environ.get(MAX_RATE_ENV, MAX_RATE))
+    return rate, max(rate, max_rate)
+
+
+def parse_retry_after(value) -> Optional[float]:
+    # Retry-After is either a number of seconds or an HTTP date
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+class TokenBucket:
+    # Token bucket whose refill rate adapts AIMD-style: halve on 429,
+    # creep back up by INCREASE_STEP after every SUCCESS_WINDOW successes.
+    # A 429 for a request sent before the last cut belongs to the same
+    # burst and does not cut again, so N batches in flight cost one halving.
+
+    def __init__(self, rate: float = DEFAULT_RATE, min_rate: float = MIN_RATE,
+                 max_rate: float = MAX_RATE):
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.tokens = 1.0
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.decreased_at = float('-inf')
+        self.successes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def capacity(self) -> float:
+        return max(1.0, self.rate)
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, cost: float = 1.0) -> float:
+        # Take the tokens now (possibly going into debt) and return how long
+        # the caller has to wait before the request may be sent
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.tokens -= cost
+            delay = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            return max(delay, self.blocked_until - now)
+
+    def acquire(self, cost: float = 1.0):
+        delay = self.reserve(cost)
+        if delay > 0:
+            time.sleep(delay)
+
+    async def acquire_async(self, cost: float = 1.0):
+        delay = self.reserve(cost)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def on_success(self):
+        with self._lock:
+            self.successes += 1
+            if self.successes >= SUCCESS_WINDOW:
+                self.successes = 0
+                self.rate = min(self.max_rate, self.rate + INCREASE_STEP)
+
+    def on_rate_limited(self, retry_after: Optional[float] = None, sent_at: Optional[float] = None) -> float:
+        # sent_at: time.monotonic() when the throttled request was sent
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.successes = 0
+            if sent_at is None or sent_at >= self.decreased_at:
+                self.rate = max(self.min_rate, self.rate * DECREASE_FACTOR)
+                self.decreased_at = now
+            self.tokens = min(self.tokens, 0.0)
+            wait = retry_after if retry_after is not None else 1 / self.rate
+            self.blocked_until = max(self.blocked_until, now + wait)
+            return wait
+
+
+class RateLimiter:
+    # One adaptive token bucket per RPC endpoint
+
+    def __init__(self, endpoints: Iterable[str] = (), rate: float = DEFAULT_RATE,
+                 min_rate: float = MIN_RATE, max_rate: float = MAX_RATE):
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.buckets: Dict[str, TokenBucket] = {}
+        for endpoint in endpoints:
+            self.bucket(endpoint)
+
+    def bucket(self, endpoint: str) -> TokenBucket:
+        if endpoint not in self.buckets:
+            self.buckets[endpoint] = TokenBucket(self.rate, self.min_rate, self.max_rate)
+        return self.buckets[endpoint]
+
+    def acquire(self, endpoint: str, cost: float = 1.0):
+        self.bucket(endpoint).acquire(cost)
+
+    async def acquire_async(self, endpoint: str, cost: float = 1.0):
+        await self.bucket(endpoint).acquire_async(cost)
+
+    def succeeded(self, endpoint: str):
+        self.bucket(endpoint).on_success()
+
+    def throttled(self, endpoint: str, retry_after_header=None, sent_at: Optional[float] = None) -> float:
+        bucket = self.bucket(endpoint)
+        wait = bucket.on_rate_limited(parse_retry_after(retry_after_header), sent_at)
+        print(f"Rate limited by {endpoint}, slowing to {bucket.rate:.2f} req/s "
+              f"and pausing {wait:.1f}s")
+        return wait
@@ -0,0 +1,312 @@
+import asyncio
+import os
+import time
+from typing import Dict, List, Optional
+
+import aiohttp
+import requests
+from requests.adapters import HTTPAdapter
+
+from endpoint_pool import EndpointPool
+from instrumentation import metrics, payload_method
+from rate_limiter import RateLimiter, rates_from_env
+from rpc_decode import STREAM_THRESHOLD, decode_batch, decode_reply, decode_stream
+from rpc_scheduler import RequestScheduler
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+
+DEFAULT_ENDPOINTS = ["https://api.mainnet-beta.solana.com"]
+ENDPOINTS_ENV = 'SOLANA_RPC_URL'  # comma-separated override, e.g. a local mock_rpc_server.py
+
+MAX_RETRIES = 5
+WAIT_TIME = 1  # minimum wait when every endpoint is cooling down
+RETRY_DELAY = 1.0  # seconds before retrying a failed request, doubled per failure
+MAX_RETRY_DELAY = 16.0
+# 429s the rate limiter has already paced for; they do not use up
+# max_retries, up to this many per request
+MAX_THROTTLED_RETRIES = 20
+REQUEST_TIMEOUT = 30  # seconds without a byte from the server
+CONNECT_TIMEOUT = 10
+KEEPALIVE_TIMEOUT = 60  # seconds an idle connection is kept for reuse
+DNS_CACHE_TTL = 300
+
+BATCH_SIZE = 20  # JSON-RPC calls packed into one HTTP request by the scheduler
+MAX_IN_FLIGHT_PER_ENDPOINT = 4  # concurrent HTTP requests per endpoint
+SYNC_POOL_SIZE = 4  # kept-alive connections per host for the blocking client
+STREAM_CHUNK_SIZE = 64 * 1024
+
+HEADERS = {"Content-Type": "application/json"}
+
+
+def endpoints_from_env(default: Optional[List[str]] = None) -> List[str]:
+    override = os.environ.get(ENDPOINTS_ENV)
+    if override:
+        return [url.strip() for url in override.split(',') if url.strip()]
+    return list(default or DEFAULT_ENDPOINTS)
+
+
+def rpc_batch(method: str, params_list: List) -> List[Dict]:
+    return [{
+        "jsonrpc": "2.0",
+        "id": i,
+        "method": method,
+        "params": params
+    } for i, params in enumerate(params_list)]
+
+
+def _methods_by_id(payload) -> Dict:
+    requests_list = payload if isinstance(payload, list) else [payload]
+    return {request['id']: request['method'] for request in requests_list}
+
+
+class _ClientBase:
+    # Endpoint choice, rate limiting and metrics shared by the blocking and
+    # asyncio clients; only the transport differs
+
+    def __init__(self, endpoints: Optional[List[str]] = None, max_retries: int = MAX_RETRIES,
+                 retry_delay: float = RETRY_DELAY, rate: Optional[float] = None, max_rate: Optional[float] = None):
+        self.endpoints = endpoints_from_env(endpoints) if endpoints is None else list(endpoints)
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.endpoint_pool = EndpointPool(self.endpoints)
+        # Per-endpoint requests per second; RPC_RATE / RPC_MAX_RATE override
+        rate, max_rate = rates_from_env(rate, max_rate)
+        self.rate_limiter = RateLimiter(self.endpoints, rate=rate, max_rate=max_rate)
+
+    def _succeeded(self, endpoint: str, rpc_method: str, calls: int, latency: float):
+        metrics.observe('rpc_request_seconds', latency, endpoint=endpoint, method=rpc_method)
+        metrics.count('rpc_calls_total', calls, method=rpc_method)
+        self.endpoint_pool.record_success(endpoint, latency)
+        self.rate_limiter.succeeded(endpoint)
+
+    def _throttled(self, endpoint: str, retry_after_header, sent_at: float, throttles: int) -> bool:
+        # True while the 429 should not count as an attempt
+        metrics.count('rpc_rate_limited_total', endpoint=endpoint)
+        self.endpoint_pool.record_throttled(endpoint)
+        self.rate_limiter.throttled(endpoint, retry_after_header, sent_at)
+        return throttles <= MAX_THROTTLED_RETRIES
+
+    def _failed(self, endpoint: str, reason: str, failures: int) -> float:
+        # Seconds to back off before the next attempt
+        metrics.count('rpc_errors_total', endpoint=endpoint)
+        self.endpoint_pool.record_failure(endpoint)
+        print(reason)
+        return min(MAX_RETRY_DELAY, self.retry_delay * 2 ** (failures - 1))
+
+    def _no_endpoint_wait(self, name: str) -> float:
+        # Every circuit is open: wait for the first cooldown to run out
+        # instead of spending attempts on it
+        wait = max(WAIT_TIME, self.endpoint_pool.wait_time())
+        print(f"No healthy endpoints for {name}, waiting {wait:.1f}s...")
+        return wait
+
+    def summary(self) -> str:
+        return self.endpoint_pool.summary()
+
+
+class RpcClient(_ClientBase):
+    # Blocking client over one pooled requests.Session, so every call after
+    # the first reuses a kept-alive TCP+TLS connection. http2=True switches
+    # to httpx (needs httpx[http2]).
+
+    def __init__(self, endpoints: Optional[List[str]] = None, max_retries: int = MAX_RETRIES,
+                 pool_size: int = SYNC_POOL_SIZE, http2: bool = False, retry_delay: float = RETRY_DELAY,
+                 rate: Optional[float] = None, max_rate: Optional[float] = None):
+        super().__init__(endpoints, max_retries, retry_delay, rate, max_rate)
+        if http2 and httpx is not None:
+            self.session = httpx.Client(
+                http2=True,
+                headers=HEADERS,
+                limits=httpx.Limits(max_keepalive_connections=pool_size * len(self.endpoints),
+                                    keepalive_expiry=KEEPALIVE_TIMEOUT)
+            )
+            self.timeout = httpx.Timeout(REQUEST_TIMEOUT, connect=CONNECT_TIMEOUT)
+            self.transport_errors = (httpx.HTTPError,)
+        else:
+            if http2:
+                print("httpx is not installed; using HTTP/1.1 keep-alive")
+            self.session = requests.Session()
+            self.session.headers.update(HEADERS)
+            adapter = HTTPAdapter(pool_connections=len(self.endpoints), pool_maxsize=pool_size, max_retries=0)
+            self.session.mount('https://', adapter)
+            self.session.mount('http://', adapter)
+            self.timeout = (CONNECT_TIMEOUT, REQUEST_TIMEOUT)
+            self.transport_errors = (requests.exceptions.RequestException,)
+
+    def post(self, payload, batch_name: str = "") -> Optional[bytes]:
+        # Body of the first 200 reply, or None once retries run out
+        rpc_method = payload_method(payload)
+        failures = 0
+        throttles = 0
+        attempt = 0
+        while attempt < self.max_retries:
+            endpoint = self.endpoint_pool.choose()
+            if endpoint is None:
+                time.sleep(self._no_endpoint_wait(batch_name or rpc_method))
+                continue
+            if attempt:
+                metrics.count('rpc_retries_total', method=rpc_method)
+            attempt += 1
+            backoff = 0.0
+            try:
+                with metrics.timer('rate_limit_wait_seconds', endpoint=endpoint):
+                    self.rate_limiter.acquire(endpoint)
+                start = time.monotonic()
+                response = self.session.post(endpoint, json=payload, timeout=self.timeout)
+                metrics.count('rpc_responses_total', endpoint=endpoint, status=response.status_code)
+                if response.status_code == 200:
+                    body = response.content
+                    self._succeeded(endpoint, rpc_method, len(payload) if isinstance(payload, list) else 1,
+                                    time.monotonic() - start)
+                    return body
+                if response.status_code == 429:
+                    throttles += 1
+                    if self._throttled(endpoint, response.headers.get('Retry-After'), start, throttles):
+                        attempt -= 1
+                else:
+                    failures += 1
+                    backoff = self._failed(endpoint, f"Error {response.status_code} from {endpoint} in "
+                                                     f"{batch_name or rpc_method}", failures)
+            except self.transport_errors as e:
+                failures += 1
+                backoff = self._failed(endpoint, f"Error in {batch_name or rpc_method} on {endpoint}: {str(e)}",
+                                       failures)
+            finally:
+                self.endpoint_pool.release(endpoint)
+            if backoff and attempt < self.max_retries:
+                time.sleep(backoff)
+        return None
+
+    def call_batch(self, method: str, params_list: List, batch_name: str = "") -> List[Dict]:
+        # Replies to one JSON-RPC array of `method` calls ([] on failure)
+        payload = rpc_batch(method, params_list)
+        body = self.post(payload, batch_name or f"{method} x{len(params_list)}")
+        if body is None:
+            return []
+        with metrics.timer('decode_seconds', method=method):
+            result = decode_batch(body, _methods_by_id(payload))
+        return result if isinstance(result, list) else []
+
+    def call(self, method: str, params: List) -> Optional[Dict]:
+        payload = {"jsonrpc": "2.0", "id": 1, "method": method, "params": params}
+        body = self.post(payload)
+        if body is None:
+            return None
+        with metrics.timer('decode_seconds', method=method):
+            result = decode_reply(body, method)
+        return result if isinstance(result, dict) else None
+
+    def close(self):
+        self.session.close()
+
+
+class AsyncRpcClient(_ClientBase):
+    # asyncio counterpart of RpcClient over one aiohttp session. The
+    # connector keeps up to max_in_flight connections per endpoint alive
+    # and caches DNS, so steady-state requests skip the handshake. Use as
+    # `async with AsyncRpcClient(...) as client:`.
+
+    def __init__(self, endpoints: Optional[List[str]] = None, max_retries: int = MAX_RETRIES,
+                 batch_size: int = BATCH_SIZE, max_in_flight_per_endpoint: int = MAX_IN_FLIGHT_PER_ENDPOINT,
+                 retry_delay: float = RETRY_DELAY, rate: Optional[float] = None, max_rate: Optional[float] = None):
+        super().__init__(endpoints, max_retries, retry_delay, rate, max_rate)
+        self.batch_size = batch_size
+        self.max_in_flight_per_endpoint = max_in_flight_per_endpoint
+        self.session: Optional[aiohttp.ClientSession] = None
+        self._scheduler: Optional[RequestScheduler] = None
+
+    @property
+    def max_in_flight(self) -> int:
+        return self.max_in_flight_per_endpoint * len(self.endpoints)
+
+    async def __aenter__(self) -> 'AsyncRpcClient':
+        connector = aiohttp.TCPConnector(
+            limit=self.max_in_flight,
+            limit_per_host=self.max_in_flight_per_endpoint,
+            keepalive_timeout=KEEPALIVE_TIMEOUT,
+            ttl_dns_cache=DNS_CACHE_TTL
+        )
+        self.session = aiohttp.ClientSession(
+            connector=connector,
+            headers=HEADERS,
+            timeout=aiohttp.ClientTimeout(total=None, sock_connect=CONNECT_TIMEOUT, sock_read=REQUEST_TIMEOUT)
+        )
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.session.close()
+        self.session = None
+        self._scheduler = None
+
+    async def post_batch(self, payload: List[Dict], batch_name: str = "", raw: bool = False):
+        # Decoded replies ([] on failure), or with raw=True the undecoded
+        # body (b'' on failure)
+        rpc_method = payload_method(payload)
+        failures = 0
+        throttles = 0
+        attempt = 0
+        while attempt < self.max_retries:
+            endpoint = self.endpoint_pool.choose()
+            if endpoint is None:
+                await asyncio.sleep(self._no_endpoint_wait(batch_name))
+                continue
+            if attempt:
+                metrics.count('rpc_retries_total', method=rpc_method)
+            attempt += 1
+            backoff = 0.0
+            try:
+                with metrics.timer('rate_limit_wait_seconds', endpoint=endpoint):
+                    await self.rate_limiter.acquire_async(endpoint)
+                start = time.monotonic()
+                async with self.session.post(endpoint, json=payload) as response:
+                    metrics.count('rpc_responses_total', endpoint=endpoint, status=response.status)
+                    if response.status == 200:
+                        methods = _methods_by_id(payload)
+                        if raw:
+                            result = await response.read()
+                        elif response.content_length is None or response.content_length > STREAM_THRESHOLD:
+                            with metrics.timer('decode_seconds', method=rpc_method, stage='stream'):
+                                result = await decode_stream(response.content.iter_chunked(STREAM_CHUNK_SIZE), methods)
+                        else:
+                            body = await response.read()
+                            with metrics.timer('decode_seconds', method=rpc_method, stage='event_loop'):
+                                result = decode_batch(body, methods)
+                        self._succeeded(endpoint, rpc_method, len(payload), time.monotonic() - start)
+                        return result
+                    elif response.status == 429:  # Rate limit
+                        throttles += 1
+                        if self._throttled(endpoint, response.headers.get('Retry-After'), start, throttles):
+                            attempt -= 1
+                    else:
+                        failures += 1
+                        backoff = self._failed(endpoint, f"Error {response.status} from {endpoint} in {batch_name}",
+                                               failures)
+            except Exception as e:
+                failures += 1
+                backoff = self._failed(endpoint, f"Error in {batch_name} on {endpoint}: {str(e)}", failures)
+            finally:
+                self.endpoint_pool.release(endpoint)
+            if backoff and attempt < self.max_retries:
+                await asyncio.sleep(backoff)
+        return b'' if raw else []
+
+    async def call_batch(self, method: str, params_list: List, batch_name: str = "") -> List:
+        return await self.post_batch(rpc_batch(method, params_list), batch_name or f"{method} x{len(params_list)}")
+
+    def scheduler(self) -> RequestScheduler:
+        # One shared scheduler, so individual calls from every caller are
+        # packed into the same batches
+        if self._scheduler is None:
+            self._scheduler = RequestScheduler(
+                lambda payload: self.post_batch(payload, f"batch of {len(payload)} requests"),
+                batch_size=self.batch_size,
+                max_in_flight=self.max_in_flight
+            )
+        return self._scheduler
+
+    async def call(self, method: str, params: List) -> Optional[Dict]:
+        return await self.scheduler().call(method, params)
@@ -0,0 +1,234 @@
+import json
+import re
+from typing import Any, AsyncIterable, Dict, List, Optional, Union
+
+# Fastest available JSON backend: msgspec (typed, skips unused fields),
+# then orjson, then the standard library
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+if msgspec is not None:
+    _generic_decoder = msgspec.json.Decoder()
+    loads = _generic_decoder.decode
+elif orjson is not None:
+    loads = orjson.loads
+else:
+    def loads(data):
+        return json.loads(data)
+
+
+STREAM_THRESHOLD = 4 * 1024 * 1024  # replies larger than this are parsed incrementally
+
+
+if msgspec is not None:
+    # Typed shapes for the results we consume. Fields not declared here
+    # (logs, instructions, token balances, ...) are skipped by the decoder
+    # instead of being built into dicts.
+
+    class Context(msgspec.Struct, omit_defaults=True):
+        slot: Optional[int] = None
+
+    class BalanceResult(msgspec.Struct, omit_defaults=True):
+        value: int
+        context: Context = msgspec.field(default_factory=Context)
+
+    class AccountLamports(msgspec.Struct):
+        lamports: int
+
+    class MultipleAccountsResult(msgspec.Struct, omit_defaults=True):
+        value: List[Optional[AccountLamports]]
+        context: Context = msgspec.field(default_factory=Context)
+
+    class SignatureInfo(msgspec.Struct):
+        signature: str
+        slot: int
+        blockTime: Optional[int] = None
+        err: Any = None
+
+    class ParsedAccountKey(msgspec.Struct):
+        pubkey: str
+
+    class Message(msgspec.Struct):
+        accountKeys: List[Union[str, ParsedAccountKey]]
+
+    class JsonTransaction(msgspec.Struct):
+        message: Message
+
+    class LoadedAddresses(msgspec.Struct):
+        writable: List[str] = []
+        readonly: List[str] = []
+
+    class TransactionMeta(msgspec.Struct, omit_defaults=True):
+        loadedAddresses: Optional[LoadedAddresses] = None
+
+    class TransactionKeysResult(msgspec.Struct, omit_defaults=True):
+        slot: int
+        transaction: Union[List[str], JsonTransaction]
+        blockTime: Optional[int] = None
+        meta: Optional[TransactionMeta] = None
+
+    class BlockTransactionKeys(msgspec.Struct):
+        accountKeys: List[Union[str, ParsedAccountKey]]
+        signatures: List[str] = []
+
+    class BlockTransaction(msgspec.Struct):
+        transaction: BlockTransactionKeys
+
+    class BlockResult(msgspec.Struct, omit_defaults=True):
+        transactions: List[BlockTransaction] = []
+        parentSlot: Optional[int] = None
+        blockTime: Optional[int] = None
+
+    class Envelope(msgspec.Struct):
+        id: Any = None
+
+    def _reply_type(result_type):
+        # 'result' is required, so error replies fail validation and take
+        # the untyped path
+        return msgspec.defstruct(
+            'Reply',
+            [('result', Optional[result_type]), ('jsonrpc', str, '2.0'), ('id', Any, None)]
+        )
+
+    _typed_decoders = {
+        method: msgspec.json.Decoder(_reply_type(result_type))
+        for method, result_type in {
+            'getBalance': BalanceResult,
+            'getMultipleAccounts': MultipleAccountsResult,
+            'getSignaturesForAddress': List[SignatureInfo],
+            'getTransaction': TransactionKeysResult,
+            'getBlock': BlockResult,
+            'getBlocks': List[int],
+        }.items()
+    }
+    _envelope_decoder = msgspec.json.Decoder(Envelope)
+    _raw_array_decoder = msgspec.json.Decoder(List[msgspec.Raw])
+
+
+def decode_reply(data: bytes, method: Optional[str] = None) -> Any:
+    if msgspec is not None and method in _typed_decoders:
+        try:
+            return msgspec.to_builtins(_typed_decoders[method].decode(data))
+        except msgspec.ValidationError:
+            # Unexpected shape (e.g. an error payload); fall back to untyped
+            pass
+    return loads(data)
+
+
+def _decode_element(data: bytes, methods: Dict[Any, str]) -> Any:
+    if msgspec is not None:
+        reply_id = _envelope_decoder.decode(data).id
+        return decode_reply(data, methods.get(reply_id))
+    return loads(data)
+
+
+def decode_batch(data: bytes, methods: Dict[Any, str]) -> Any:
+    # methods maps each request id in the batch to its RPC method, so
+    # every reply is decoded with the schema for its own call
+    if msgspec is not None:
+        try:
+            elements = _raw_array_decoder.decode(data)
+        except msgspec.ValidationError:
+            # Not an array: the endpoint answered the batch with one object
+            return loads(data)
+        return [_decode_element(element, methods) for element in elements]
+    return loads(data)
+
+
+_STRUCTURAL = re.compile(rb'[\[\]{}",\\]')
+
+
+class ArraySplitter:
+    # Incrementally splits a top-level JSON array arriving in chunks into
+    # its element byte strings, so only one element is held at a time.
+    # Jumps between structural characters with a regex rather than
+    # walking every byte.
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.scan_from = 0
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+        self.element_start = None
+        self.started = False
+
+    def feed(self, chunk: bytes) -> List[bytes]:
+        self.buffer.extend(chunk)
+        elements = []
+        position = self.scan_from
+        while True:
+            if self.escaped:
+                # The character after a backslash can never end a string
+                if position >= len(self.buffer):
+                    break
+                self.escaped = False
+                position += 1
+                continue
+            match = _STRUCTURAL.search(self.buffer, position)
+            if match is None:
+                position = len(self.buffer)
+                break
+            char = self.buffer[match.start()]
+            position = match.end()
+            if self.in_string:
+                if char == 0x5c:  # backslash
+                    self.escaped = True
+                elif char == 0x22:  # quote
+                    self.in_string = False
+                continue
+            if char == 0x22:
+                self.in_string = True
+            elif char in b'[{':
+                self.depth += 1
+                if self.depth == 1:
+                    self.started = True
+                    self.element_start = position
+            elif char in b']}':
+                self.depth -= 1
+                if self.depth == 0:
+                    elements.append(self._take(match.start()))
+            elif char == 0x2c and self.depth == 1:  # comma between elements
+                elements.append(self._take(match.start()))
+                self.element_start = position
+        self.scan_from = position
+        # Drop everything already handed out
+        if self.element_start is not None and self.element_start > 0:
+            del self.buffer[:self.element_start]
+            self.scan_from -= self.element_start
+            self.element_start = 0
+        return [element for element in elements if element.strip()]
+
+    def _take(self, end: int) -> bytes:
+        return bytes(self.buffer[self.element_start:end])
+
+
+async def decode_stream(chunks: AsyncIterable[bytes], methods: Dict[Any, str]) -> List[Any]:
+    # Decode a batch reply element by element as the bytes arrive, keeping
+    # peak memory at one element (plus the decoded results)
+    splitter = ArraySplitter()
+    replies = []
+    head = b''
+    async for chunk in chunks:
+        if not splitter.started:
+            # Replies that are a single object rather than an array are
+            # rare (whole-batch errors) and small; buffer them whole
+            head += chunk
+            if not head.lstrip():
+                continue
+            if head.lstrip()[:1] != b'[':
+                continue
+            chunk, head = head, b''
+        for element in splitter.feed(chunk):
+            replies.append(_decode_element(element, methods))
+    if head:
+        return loads(head)
+    return replies
@@ -0,0 +1,73 @@
+import asyncio
+import itertools
+from typing import Awaitable, Callable, Dict, List, Optional
+
+
+# A sender posts one JSON-RPC array and returns the list of replies
+# (or an empty list when the whole batch failed).
+BatchSender = Callable[[List[Dict]], Awaitable[List[Dict]]]
+
+
+class RequestScheduler:
+    # Packs individual calls into JSON-RPC batches of up to batch_size and
+    # keeps at most max_in_flight batches on the wire at once. Replies are
+    # matched back to callers by id since batch replies may be reordered.
+
+    def __init__(self, send: BatchSender, batch_size: int, max_in_flight: int,
+                 flush_interval: float = 0.005):
+        self.send = send
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self._semaphore = asyncio.Semaphore(max(1, max_in_flight))
+        self._ids = itertools.count()
+        self._pending = []
+        self._flush_handle = None
+        self._tasks = set()
+
+    async def call(self, method: str, params: List) -> Optional[Dict]:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        request = {
+            "jsonrpc": "2.0",
+            "id": next(self._ids),
+            "method": method,
+            "params": params
+        }
+        self._pending.append((request, future))
+
+        if len(self._pending) >= self.batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            # Give other callers a moment to join this batch
+            self._flush_handle = loop.call_later(self.flush_interval, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        while self._pending:
+            batch = self._pending[:self.batch_size]
+            self._pending = self._pending[self.batch_size:]
+            task = asyncio.ensure_future(self._dispatch(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _dispatch(self, batch):
+        async with self._semaphore:
+            try:
+                replies = await self.send([request for request, _ in batch])
+            except Exception as e:
+                print(f"Error sending batch of {len(batch)} requests: {str(e)}")
+                replies = []
+
+        replies_by_id = {}
+        if isinstance(replies, list):
+            replies_by_id = {
+                reply.get('id'): reply for reply in replies if isinstance(reply, dict)
+            }
+
+        for request, future in batch:
+            if not future.done():
+                future.set_result(replies_by_id.get(request['id']))
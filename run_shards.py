@@ -0,0 +1,102 @@
+import argparse
+import os
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+from benchmark import free_port, start_server
+from sharding import partial_graph_path
+
+
+SCRIPT = 'trans_analysis.py'
+DEFAULT_SHEET = 'multicAIn capital DAOs.xlsx'  # trans_analysis.py's INPUT_FILE default
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def run_shards(shards: int, endpoints: List[str], workdir: str, sheet: str) -> List[Dict]:
+    # Starts one trans_analysis.py process per shard, each in its own
+    # directory (journal, metrics) and against its own endpoint, then the
+    # merge run once all of them have written their partial graph. Each
+    # runs in its own directory, so the sheet path must be absolute.
+    base_env = dict(os.environ, SHARDS=str(shards), SHARD_DIR=workdir, PYTHONUNBUFFERED='1',
+                    ADDRESS_SHEET=os.path.abspath(sheet))
+
+    runs = []
+    for shard in range(shards):
+        shard_dir = os.path.join(workdir, f'shard_{shard}')
+        os.makedirs(shard_dir, exist_ok=True)
+        env = dict(base_env, SHARD=str(shard))
+        if endpoints:
+            env['SOLANA_RPC_URL'] = endpoints[shard % len(endpoints)]
+        log = open(os.path.join(shard_dir, 'shard.log'), 'wb')
+        process = subprocess.Popen([sys.executable, os.path.join(REPO_DIR, SCRIPT)], cwd=shard_dir, env=env,
+                                   stdout=log, stderr=subprocess.STDOUT)
+        runs.append({'shard': shard, 'process': process, 'log': log, 'start': time.perf_counter()})
+        print(f"Shard {shard} started (pid {process.pid}, {env.get('SOLANA_RPC_URL', 'default endpoints')})")
+
+    results = []
+    for run in runs:
+        exit_code = run['process'].wait()
+        run['log'].close()
+        results.append({'shard': run['shard'], 'exit_code': exit_code,
+                        'wall_time': time.perf_counter() - run['start']})
+        print(f"Shard {run['shard']} finished in {results[-1]['wall_time']:.1f}s (exit {exit_code})")
+
+    if any(result['exit_code'] != 0 for result in results):
+        print("Some shards failed; not merging")
+        return results
+    missing = [path for path in (partial_graph_path(workdir, shard, shards) for shard in range(shards))
+               if not os.path.exists(path)]
+    if missing:
+        print(f"Missing partial graphs {', '.join(missing)}; not merging")
+        results.append({'shard': 'merge', 'exit_code': 1, 'wall_time': 0.0})
+        return results
+
+    start = time.perf_counter()
+    merge = subprocess.run([sys.executable, os.path.join(REPO_DIR, SCRIPT)], cwd=workdir,
+                           env=dict(base_env, SHARD='merge'))
+    results.append({'shard': 'merge', 'exit_code': merge.returncode, 'wall_time': time.perf_counter() - start})
+    print(f"Merge finished in {results[-1]['wall_time']:.1f}s (exit {merge.returncode})")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run trans_analysis.py as K address shards, then merge them')
+    parser.add_argument('--shards', type=int, default=os.cpu_count() or 2)
+    parser.add_argument('--endpoints', nargs='+', default=[],
+                        help='RPC endpoints, assigned to shards round-robin (default: SOLANA_RPC_URL)')
+    parser.add_argument('--sheet', default=None, help='address sheet (default: ADDRESS_SHEET, then the script default)')
+    parser.add_argument('--workdir', default='shards', help='partial graphs, shard logs and the merged results')
+    parser.add_argument('--mock-addresses', type=int, default=None,
+                        help='start one mock_rpc_server.py per shard over a synthetic graph of this size')
+    args = parser.parse_args()
+
+    workdir = os.path.abspath(args.workdir)
+    os.makedirs(workdir, exist_ok=True)
+    servers = []
+    endpoints = list(args.endpoints)
+    # Resolved against the caller's directory, not the shards'
+    sheet = os.path.abspath(args.sheet or os.environ.get('ADDRESS_SHEET', DEFAULT_SHEET))
+    try:
+        if args.mock_addresses:
+            # Same seed, so every shard sees the same synthetic chain
+            if not args.sheet:
+                sheet = os.path.join(workdir, 'addresses.parquet')
+            subprocess.run([sys.executable, os.path.join(REPO_DIR, 'mock_rpc_server.py'),
+                            '--addresses', str(args.mock_addresses), '--write-sheet', sheet],
+                           check=True, stdout=subprocess.DEVNULL)
+            for _ in range(args.shards):
+                port = free_port()
+                servers.append(start_server(args.mock_addresses, port, []))
+                endpoints.append(f'http://localhost:{port}/')
+        results = run_shards(args.shards, endpoints, workdir, sheet)
+    finally:
+        for server in servers:
+            server.terminate()
+            server.wait()
+    sys.exit(0 if all(result['exit_code'] == 0 for result in results) else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+import itertools
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+import pandas as pd
+
+from address_registry import AddressRegistry
+
+
+HIGH_RISK_SCORE = 2  # related addresses at which a recommendation turns into 'No (High Risk)'
+
+
+def address_rows(registry: AddressRegistry) -> Tuple[np.ndarray, np.ndarray]:
+    # (DataFrame row, address id) for every sheet row holding a watched address
+    counts = [len(rows) for rows in registry.row_index]
+    ids = np.repeat(np.arange(len(registry), dtype=np.int64), counts)
+    rows = np.fromiter(itertools.chain.from_iterable(registry.row_index), dtype=np.int64, count=sum(counts))
+    return rows, ids
+
+
+def _members_by_group(labels: np.ndarray, sizes: np.ndarray) -> List[np.ndarray]:
+    # Address ids of every multi-address group, ascending within each group,
+    # groups ordered by their lowest id
+    grouped = np.flatnonzero(sizes[labels] > 1)
+    if not len(grouped):
+        return []
+    order = grouped[np.argsort(labels[grouped], kind='stable')]
+    starts = np.flatnonzero(np.diff(labels[order], prepend=-1))
+    groups = np.split(order, starts[1:])
+    groups.sort(key=lambda members: members[0])
+    return groups
+
+
+def related_addresses(registry: AddressRegistry, labels: np.ndarray, sizes: np.ndarray) -> np.ndarray:
+    # Per address id, the other members of its group joined in sheet order
+    # ('None' for addresses in no group)
+    related = np.full(len(registry), 'None', dtype=object)
+    for members in _members_by_group(labels, sizes):
+        addresses = [registry.address(address_id) for address_id in members]
+        for position, address_id in enumerate(members):
+            related[address_id] = ', '.join(addresses[:position] + addresses[position + 1:])
+    return related
+
+
+def cluster_groups(registry: AddressRegistry, labels: np.ndarray, sizes: np.ndarray) -> List[Set[str]]:
+    return [
+        {registry.address(address_id) for address_id in members}
+        for members in _members_by_group(labels, sizes)
+    ]
+
+
+def score_addresses(df: pd.DataFrame, registry: AddressRegistry, labels: np.ndarray, sizes: np.ndarray,
+                    sol_threshold: float, analyzed: Optional[np.ndarray] = None):
+    # Whitelist Recommendation, Related Addresses and Risk Score for every
+    # row with a numeric Balance, written a column at a time. labels/sizes
+    # are the clustering output: group label per address id and the size
+    # of each group. Addresses outside `analyzed` (bool per address id)
+    # only get the balance verdict.
+    rows, ids = address_rows(registry)
+    balances = df.loc[rows, 'Balance'].to_numpy()
+    scored = np.fromiter((isinstance(balance, (int, float)) for balance in balances), dtype=bool, count=len(balances))
+    if not scored.any():
+        return
+    rows, ids = rows[scored], ids[scored]
+    balances = balances[scored].astype(float)
+
+    risk_scores = sizes[labels[ids]] - 1
+    recommendations = np.where(balances >= sol_threshold, 'Yes', 'No').astype(object)
+    recommendations[risk_scores >= HIGH_RISK_SCORE] = 'No (High Risk)'
+
+    df.loc[rows, 'Whitelist Recommendation'] = recommendations
+    if analyzed is not None:
+        keep = analyzed[ids]
+        rows, ids, risk_scores = rows[keep], ids[keep], risk_scores[keep]
+    df.loc[rows, 'Related Addresses'] = related_addresses(registry, labels, sizes)[ids]
+    df.loc[rows, 'Risk Score'] = risk_scores.tolist()
+
+
+def summarize_clusters(df: pd.DataFrame, balances: Dict[str, float], sol_threshold: float) -> Dict[str, Dict]:
+    # Fills Balance / Whitelist Recommendation from fetched balances and
+    # returns per-cluster totals, keyed by cluster name in sheet order.
+    # Rows with no balance, or above the first "Cluster N:" header, are
+    # marked 'Error'.
+    cells = df[0]
+    text = cells.astype(str)
+    is_header = cells.notna() & text.str.startswith('Cluster')
+    is_address = cells.notna() & ~is_header
+    cluster = text.where(is_header).str.strip(':').ffill()
+
+    balance = text[is_address].map(balances)
+    ok = balance.notna() & cluster[is_address].notna()
+    ok_rows, error_rows = ok.index[ok], ok.index[~ok]
+    balance = balance[ok].astype(float)
+    recommended = balance >= sol_threshold
+
+    df.loc[ok_rows, 'Balance'] = balance
+    df.loc[ok_rows, 'Whitelist Recommendation'] = np.where(recommended, 'Yes', 'No')
+    df.loc[error_rows, 'Balance'] = 'Error'
+    df.loc[error_rows, 'Whitelist Recommendation'] = 'Error'
+
+    frame = pd.DataFrame({
+        'cluster': cluster[ok_rows],
+        'address': cells[ok_rows],
+        'balance': balance,
+        'recommended': recommended,
+    })
+    totals = frame.groupby('cluster', sort=False).agg(
+        total_addresses=('balance', 'size'),
+        recommended_addresses=('recommended', 'sum'),
+        total_balance=('balance', 'sum'),
+    )
+    above = frame[frame['recommended']].groupby('cluster', sort=False)['address'].agg(list)
+
+    cluster_stats = {}
+    for name in text[is_header].str.strip(':'):
+        cluster_stats[name] = {
+            'total_addresses': int(totals['total_addresses'].get(name, 0)),
+            'recommended_addresses': int(totals['recommended_addresses'].get(name, 0)),
+            'total_balance': float(totals['total_balance'].get(name, 0)),
+            'addresses_above_threshold': above.get(name, []),
+        }
+    return cluster_stats
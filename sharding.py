@@ -0,0 +1,68 @@
+import hashlib
+import os
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from address_registry import AddressRegistry
+from interaction_graph import InteractionGraph
+
+
+PARTIAL_GRAPH_FILE = 'partial_graph_{shard}_of_{shards}.npz'
+
+
+def registry_fingerprint(registry: AddressRegistry) -> str:
+    # Identifies the address list (and so the address ids) a result belongs to
+    return hashlib.sha1('\n'.join(registry.addresses).encode()).hexdigest()
+
+
+def shard_of(address: str, shards: int) -> int:
+    # Stable across processes and machines, unlike hash()
+    return int.from_bytes(hashlib.blake2b(address.encode(), digest_size=8).digest(), 'big') % shards
+
+
+def shard_addresses(addresses: List[str], shard: int, shards: int) -> List[str]:
+    return [address for address in addresses if shard_of(address, shards) == shard]
+
+
+def partial_graph_path(directory: str, shard: int, shards: int) -> str:
+    return os.path.join(directory, PARTIAL_GRAPH_FILE.format(shard=shard, shards=shards))
+
+
+def save_partial_graph(path: str, registry: AddressRegistry, shard: int, shards: int,
+                       graph: InteractionGraph, balances: Dict[str, float]):
+    # One shard's result: its pairwise interaction counts (every pair seen
+    # at least once) and the balances it fetched, keyed by address id
+    a, b, counts = graph.edges(1)
+    balance_ids = np.array([registry.id(address) for address in balances], dtype=np.int64)
+    balance_values = np.array(list(balances.values()), dtype=np.float64)
+    with open(path + '.tmp', 'wb') as f:
+        np.savez_compressed(
+            f,
+            fingerprint=np.array(registry_fingerprint(registry)),
+            shard=np.int64(shard),
+            shards=np.int64(shards),
+            a=a.astype(np.int64), b=b.astype(np.int64), counts=counts.astype(np.int64),
+            balance_ids=balance_ids, balance_values=balance_values
+        )
+    os.replace(path + '.tmp', path)
+
+
+def load_partial_graphs(registry: AddressRegistry, directory: str,
+                        shards: int) -> Tuple[InteractionGraph, Dict[str, float]]:
+    # Sums the edge counts of all shards into one graph. Each listing of a
+    # transaction is counted by exactly one shard (the listing address's),
+    # so the sum equals the counts of a single unsharded run.
+    graph = InteractionGraph(len(registry))
+    balances = {}
+    fingerprint = registry_fingerprint(registry)
+    for shard in range(shards):
+        path = partial_graph_path(directory, shard, shards)
+        with np.load(path) as partial:
+            if str(partial['fingerprint']) != fingerprint or int(partial['shards']) != shards:
+                raise ValueError(f"{path} was written for a different address list or shard count")
+            graph.add_pairs(partial['a'], partial['b'], partial['counts'])
+            for address_id, value in zip(partial['balance_ids'], partial['balance_values']):
+                balances[registry.address(int(address_id))] = float(value)
+        print(f"Merged {path}")
+    return graph, balances
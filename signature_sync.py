@@ -0,0 +1,84 @@
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+
+MAX_DELTA_PAGES = 10  # pages walked to catch up before giving up on the gap
+
+# Fetches one page of getSignaturesForAddress for the given params and
+# returns the result list, or None if the request failed.
+PageFetcher = Callable[[List], Awaitable[Optional[List[Dict]]]]
+
+
+def page_params(address: str, limit: int, until: Optional[str] = None,
+                before: Optional[str] = None) -> List:
+    config = {"limit": limit}
+    if until:
+        config["until"] = until
+    if before:
+        config["before"] = before
+    return [address, config]
+
+
+def merge_signatures(newer: List[Dict], older: List[Dict]) -> List[Dict]:
+    seen = set()
+    merged = []
+    for entry in newer + older:
+        if entry['signature'] not in seen:
+            seen.add(entry['signature'])
+            merged.append(entry)
+    return merged
+
+
+def make_cursor(signatures: List[Dict], complete: bool) -> Dict:
+    return {
+        "newest": signatures[0]['signature'] if signatures else None,
+        "oldest": signatures[-1]['signature'] if signatures else None,
+        "complete": complete
+    }
+
+
+async def sync_signatures(fetch_page: PageFetcher, address: str, known: List[Dict],
+                          cursor: Optional[Dict], limit: int, backfill_pages: int = 0,
+                          max_delta_pages: int = MAX_DELTA_PAGES) -> Optional[Tuple[List[Dict], Dict]]:
+    # Bring an address's signature list (newest first) up to date. With a
+    # cursor only signatures newer than cursor['newest'] are requested;
+    # backfill_pages > 0 additionally pages further back with `before`.
+    until = cursor.get('newest') if cursor else None
+    complete = cursor.get('complete', False) if cursor else False
+    if not until:
+        known = []
+
+    newer = []
+    before = None
+    caught_up = False
+    for _ in range(max_delta_pages if until else 1):
+        page = await fetch_page(page_params(address, limit, until, before))
+        if page is None:
+            return None
+        newer.extend(page)
+        if len(page) < limit:
+            caught_up = True
+            break
+        before = page[-1]['signature']
+
+    if not until:
+        # First sync: a short page means we already hold the whole history
+        complete = caught_up
+    elif not caught_up:
+        # Too much new activity to bridge back to the cursor; start over
+        # from the newest pages and let backfill fill in the rest
+        print(f"Signature gap for {address}, resyncing from the newest {len(newer)}")
+        known = []
+        complete = False
+
+    signatures = merge_signatures(newer, known)
+
+    for _ in range(backfill_pages):
+        if complete or not signatures:
+            break
+        page = await fetch_page(page_params(address, limit, before=signatures[-1]['signature']))
+        if page is None:
+            break
+        signatures = merge_signatures(signatures, page)
+        complete = len(page) < limit
+
+    return signatures, make_cursor(signatures, complete)
@@ -0,0 +1,94 @@
+import numbers
+import os
+from typing import Iterable, List
+
+import pandas as pd
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+
+# Result formats written by write_results, by file extension
+COLUMNAR_FORMATS = ('parquet', 'arrow')
+RESULT_FORMATS = ('parquet',)
+
+
+def read_address_sheet(path: str) -> pd.DataFrame:
+    # The "Cluster N:" sectioned input as a header-less frame with positional
+    # columns, whatever format it is stored in
+    extension = os.path.splitext(path)[1].lower()
+    if extension in ('.parquet', '.pq'):
+        df = pd.read_parquet(path)
+    elif extension in ('.arrow', '.feather'):
+        df = pd.read_feather(path)
+    elif extension in ('.csv', '.txt'):
+        # Keep blank rows so row numbers line up with the spreadsheet it came from
+        df = pd.read_csv(path, header=None, dtype=str, skip_blank_lines=False)
+    else:
+        # pandas opens workbooks with openpyxl in read-only mode, streaming
+        # rows instead of building the full cell tree
+        df = pd.read_excel(path, header=None)
+    df.columns = range(len(df.columns))
+    return df
+
+
+def write_address_sheet(df: pd.DataFrame, path: str):
+    # Inverse of read_address_sheet: a header-less sheet in the format
+    # given by the extension
+    extension = os.path.splitext(path)[1].lower()
+    if extension in ('.parquet', '.pq'):
+        _columnar(df).to_parquet(path, index=False)
+    elif extension in ('.arrow', '.feather'):
+        _columnar(df).to_feather(path)
+    elif extension in ('.csv', '.txt'):
+        df.to_csv(path, index=False, header=False)
+    else:
+        df.to_excel(path, index=False, header=False)
+
+
+def _columnar(df: pd.DataFrame) -> pd.DataFrame:
+    # Arrow needs string column names and one type per column, while the
+    # scripts fill result columns with '' placeholders, numbers and 'Error'
+    # markers. Placeholders become nulls; a column holding anything besides
+    # numbers is stored as text.
+    table = df.copy()
+    table.columns = [str(column) for column in table.columns]
+    for column in table.columns:
+        values = table[column]
+        if values.dtype != object:
+            continue
+        values = values.where(values.notna() & (values != ''), None)
+        present = values.dropna()
+        if len(present) and present.map(lambda value: isinstance(value, numbers.Integral) and not isinstance(value, bool)).all():
+            table[column] = pd.array(values, dtype='Int64')
+        elif len(present) and present.map(lambda value: isinstance(value, numbers.Number) and not isinstance(value, bool)).all():
+            table[column] = pd.to_numeric(values)
+        else:
+            table[column] = values.map(lambda value: value if value is None else str(value))
+    return table.reset_index(drop=True)
+
+
+def write_results(df: pd.DataFrame, stem: str, formats: Iterable[str] = RESULT_FORMATS) -> List[str]:
+    # Writes df to stem.<format> for every requested format and returns the
+    # paths written. Columnar formats fall back to CSV without pyarrow.
+    written = []
+    for fmt in formats:
+        if fmt in COLUMNAR_FORMATS and pyarrow is None:
+            print(f"pyarrow is not installed, writing CSV instead of {fmt}")
+            fmt = 'csv'
+        path = f"{stem}.{fmt}"
+        if fmt == 'parquet':
+            _columnar(df).to_parquet(path, index=False)
+        elif fmt == 'arrow':
+            _columnar(df).to_feather(path)
+        elif fmt == 'csv':
+            df.to_csv(path, index=False, header=True)
+        elif fmt == 'xlsx':
+            df.to_excel(path, index=False, header=True)
+        else:
+            raise ValueError(f"Unknown result format: {fmt}")
+        if path not in written:
+            written.append(path)
+    return written
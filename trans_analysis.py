@@ -1,267 +1,232 @@
-import pandas as pd
-import requests
-import time
-import json
+import sys
 from tqdm import tqdm
 from collections import defaultdict
-import pickle
 import os
 
+from address_registry import AddressRegistry
+from bulk_balance import fetch_balances
+from checkpoint_journal import CheckpointJournal
+from gated_analysis import BalanceGatedAnalysis
+from instrumentation import metrics
+from interaction_graph import InteractionGraph
+from rpc_client import RpcClient, endpoints_from_env
+from scoring import cluster_groups, score_addresses
+from sharding import load_partial_graphs, partial_graph_path, registry_fingerprint, save_partial_graph, shard_addresses
+from table_io import read_address_sheet, write_results
+from tx_accounts import ACCOUNT_KEYS_CONFIG, decode_account_keys
+
 
 SOL_THRESHOLD = 0.2  
 TRANSACTION_LIMIT = 1000  
 INTERACTION_THRESHOLD = 2  
-SAVE_INTERVAL = 10  
+JOURNAL_SYNC_INTERVAL = 100  # results appended between fsyncs of the journal
 MAX_RETRIES = 3  
-RETRY_DELAY = 5  
-
-# Solana RPC endpoint
-url = "https://api.mainnet-beta.solana.com"
-
-
-CHECKPOINT_FILE = 'analysis_checkpoint.pkl'
-TEMP_RESULTS_FILE = 'temp_results.xlsx'
-
-def load_checkpoint():
-    if os.path.exists(CHECKPOINT_FILE):
-        with open(CHECKPOINT_FILE, 'rb') as f:
-            return pickle.load(f)
-    return {
-        'processed_index': 0,
-        'address_graph': defaultdict(set),
-        'interaction_count': defaultdict(int),
-        'df': None
-    }
-
-def save_checkpoint(checkpoint_data):
-    with open(CHECKPOINT_FILE, 'wb') as f:
-        pickle.dump(checkpoint_data, f)
-
-    if checkpoint_data['df'] is not None:
-        checkpoint_data['df'].to_excel(TEMP_RESULTS_FILE, index=False)
-    print(f"Checkpoint saved at index {checkpoint_data['processed_index']}")
-
-def make_request(method, url, headers, data, max_retries=MAX_RETRIES):
-    for attempt in range(max_retries):
-        try:
-            response = requests.post(url, headers=headers, json=data, timeout=30)
-            if response.status_code == 200:
-                return response
-        except (requests.exceptions.RequestException, requests.exceptions.Timeout) as e:
-            if attempt == max_retries - 1:
-                print(f"Error after {max_retries} attempts: {str(e)}")
-                return None
-            print(f"Request failed, retrying in {RETRY_DELAY} seconds...")
-            time.sleep(RETRY_DELAY)
-    return None
-
-def get_balance(address):
-    headers = {"Content-Type": "application/json"}
-    data = {
-        "jsonrpc": "2.0",
-        "id": 1,
-        "method": "getBalance",
-        "params": [address]
-    }
-    
-    response = make_request("POST", url, headers, data)
-    if response and response.status_code == 200:
-        result = response.json()
-        if 'result' in result:
-            return result['result']['value'] / 1_000_000_000
-    return None
-
+USE_HTTP2 = False  # needs httpx[http2]
+# Only walk the histories of addresses that pass SOL_THRESHOLD and of those
+# linked to them; the rest keep their balance verdict without a Risk Score
+PRUNE_LOW_BALANCE = False
+INPUT_FILE = os.environ.get('ADDRESS_SHEET', 'multicAIn capital DAOs.xlsx')  # .xlsx, .csv or .parquet
+OUTPUT_FORMATS = ['parquet']  # add 'xlsx' for a spreadsheet copy
+
+# Shard mode (run_shards.py drives it): SHARD=i fetches only the addresses
+# hashed to shard i of SHARDS and saves a partial graph in SHARD_DIR;
+# SHARD=merge sums the partial graphs, then clusters and scores once
+SHARD = os.environ.get('SHARD')
+SHARDS = int(os.environ.get('SHARDS', '1'))
+SHARD_DIR = os.environ.get('SHARD_DIR', '.')
+MERGE_SHARDS = SHARD == 'merge'
+SHARD_INDEX = int(SHARD) if SHARD is not None and not MERGE_SHARDS else None
+if PRUNE_LOW_BALANCE and SHARD is not None:
+    raise SystemExit("PRUNE_LOW_BALANCE walks the graph across shards; run it unsharded")
+
+# Solana RPC endpoint (SOLANA_RPC_URL overrides)
+client = RpcClient(endpoints_from_env(["https://api.mainnet-beta.solana.com"]), max_retries=MAX_RETRIES, http2=USE_HTTP2)
+
+
+JOURNAL_FILE = 'analysis_journal.jsonl'
+METRICS_FILE = 'trans_analysis_metrics.json'  # .json summary, any other name for Prometheus text
+
+def open_journal(registry):
+    # A journal only resumes the run over the same address list
+    header = {'addresses': len(registry), 'fingerprint': registry_fingerprint(registry),
+              'transaction_limit': TRANSACTION_LIMIT}
+    if PRUNE_LOW_BALANCE:
+        header['balance_gate'] = SOL_THRESHOLD
+    if SHARD is not None:
+        header['shard'] = f"{SHARD}/{SHARDS}"
+    return CheckpointJournal(JOURNAL_FILE, header, JOURNAL_SYNC_INTERVAL)
+
+# Both raise once the client has given up, so nothing is journaled for a
+# failed fetch and a resumed run fetches it again. A JSON-RPC error reply
+# (e.g. an invalid address in the sheet) will not change on a retry, so it
+# is logged and recorded as having no transactions / accounts.
 def get_recent_transactions(address):
-    headers = {"Content-Type": "application/json"}
-    data = {
-        "jsonrpc": "2.0",
-        "id": 1,
-        "method": "getSignaturesForAddress",
-        "params": [
-            address,
-            {"limit": TRANSACTION_LIMIT}
-        ]
-    }
-    
-    response = make_request("POST", url, headers, data)
-    if response and response.status_code == 200:
-        result = response.json()
-        if 'result' in result:
-            return [tx['signature'] for tx in result['result']]
-    return []
-
-def get_transaction_details(signature):
-    headers = {"Content-Type": "application/json"}
-    data = {
-        "jsonrpc": "2.0",
-        "id": 1,
-        "method": "getTransaction",
-        "params": [
-            signature,
-            {"encoding": "jsonParsed", "maxSupportedTransactionVersion": 0}
-        ]
-    }
-    
-    response = make_request("POST", url, headers, data)
-    if response and response.status_code == 200:
-        result = response.json()
-        if 'result' in result and result['result']:
-            return result['result']
+    reply = client.call("getSignaturesForAddress", [address, {"limit": TRANSACTION_LIMIT}])
+    if reply is None:
+        raise RuntimeError(f"Failed to fetch signatures for {address}: no reply")
+    if 'error' in reply or 'result' not in reply:
+        print(f"Skipping address {address}: {reply.get('error')}")
+        return []
+    return [tx['signature'] for tx in reply['result']]
+
+def get_transaction_accounts(signature):
+    # None for a transaction the node does not have or rejects
+    reply = client.call("getTransaction", [signature, ACCOUNT_KEYS_CONFIG])
+    if reply is None:
+        raise RuntimeError(f"Failed to fetch transaction {signature}: no reply")
+    if 'error' in reply:
+        print(f"Skipping transaction {signature}: {reply['error']}")
+        return None
+    if reply.get('result'):
+        return decode_account_keys(reply['result'])
     return None
 
+metrics.start_reporting(METRICS_FILE)
 
 try:
 
-    checkpoint = load_checkpoint()
-    if checkpoint['df'] is None:
-        df = pd.read_excel('multicAIn capital DAOs.xlsx', header=None)
-        df['Balance'] = ''
-        df['Whitelist Recommendation'] = ''
-        df['Related Addresses'] = ''
-        df['Risk Score'] = ''
+    metrics.mark_phase('load')
+    df = read_address_sheet(INPUT_FILE)
+    df['Balance'] = ''
+    df['Whitelist Recommendation'] = ''
+    df['Related Addresses'] = ''
+    df['Risk Score'] = ''
+
+    registry = AddressRegistry.from_dataframe(df)
+    valid_addresses = registry.addresses
+    if MERGE_SHARDS:
+        # Everything was fetched by the shard runs
+        valid_addresses = []
+    elif SHARD_INDEX is not None:
+        valid_addresses = shard_addresses(registry.addresses, SHARD_INDEX, SHARDS)
+        print(f"Shard {SHARD_INDEX} of {SHARDS}: {len(valid_addresses)} of {len(registry)} addresses")
+
+    # Rebuild progress from the journal of a previous interrupted run
+    journal = open_journal(registry)
+    balances = {}
+    address_signatures = {}
+    processed_signatures = set()
+    if MERGE_SHARDS:
+        metrics.mark_phase('merge')
+        interaction_graph, balances = load_partial_graphs(registry, SHARD_DIR, SHARDS)
+    else:
+        interaction_graph = InteractionGraph(len(registry))
+    gated = BalanceGatedAnalysis(registry, interaction_graph, journal, INTERACTION_THRESHOLD) if PRUNE_LOW_BALANCE else None
+    for record in journal.replay():
+        if record['type'] == 'balance':
+            balances[record['address']] = record['value']
+        elif gated is not None:
+            gated.replay(record)
+        elif record['type'] == 'signatures':
+            address_signatures[record['address']] = record['signatures']
+        elif record['type'] == 'transaction':
+            interaction_graph.add_transaction(record['ids'], weight=record['weight'])
+            processed_signatures.add(record['signature'])
+    if gated is not None:
+        address_signatures, processed_signatures = gated.address_signatures, gated.transaction_ids
+    if (balances or address_signatures) and not MERGE_SHARDS:
+        print(f"Resuming with {len(balances)} balances, {len(address_signatures)} addresses "
+              f"and {len(processed_signatures)} transactions already done")
+
+    metrics.mark_phase('balances')
+    print("Fetching balances...")
+    pending_balances = [address for address in valid_addresses if address not in balances]
+    for address, balance in fetch_balances(client.call_batch, pending_balances).items():
+        if balance is not None:
+            balances[address] = balance
+            journal.append({'type': 'balance', 'address': address, 'value': balance})
+    registry.assign(df, 'Balance', balances)
+
+    if gated is not None:
+        # Balance-gated walk instead of phases 1-3
+        metrics.mark_phase('transactions')
+        print("Analyzing transaction relationships from eligible addresses...")
+        gated.run(balances, SOL_THRESHOLD, get_recent_transactions, get_transaction_accounts)
     else:
-        df = checkpoint['df']
-        print(f"Resuming from index {checkpoint['processed_index']}")
-
-    address_graph = checkpoint['address_graph']
-    interaction_count = checkpoint['interaction_count']
-    
-
-    valid_addresses = []
-    current_cluster = None
-    cluster_addresses = defaultdict(list)
-
-    for index, row in df.iterrows():
-        address = row[0]
-        if pd.isna(address):
-            continue
-        if str(address).startswith('Cluster'):
-            current_cluster = address.strip(':')
-            continue
-        if current_cluster and not pd.isna(address):
-            valid_addresses.append(address)
-            cluster_addresses[current_cluster].append(address)
-
-
-    start_index = checkpoint['processed_index']
-    
-    print("Analyzing transaction relationships...")
-    for i, address in enumerate(tqdm(valid_addresses[start_index:], initial=start_index, total=len(valid_addresses))):
-        try:
-            balance = get_balance(address)
-            if balance is not None:
-                df.loc[df[0] == address, 'Balance'] = balance
-            
-        
-            transactions = get_recent_transactions(address)
-            for tx_sig in transactions:
-                tx_details = get_transaction_details(tx_sig)
-                if tx_details and 'message' in tx_details['transaction']:
-                    accounts = set()
-                    for account in tx_details['transaction']['message']['accountKeys']:
-                        if account['pubkey'] in valid_addresses:
-                            accounts.add(account['pubkey'])
-                    
-                    if len(accounts) > 1:
-                        for acc1 in accounts:
-                            for acc2 in accounts:
-                                if acc1 != acc2:
-                                    address_graph[acc1].add(acc2)
-                                    interaction_count[(acc1, acc2)] += 1
+        # Phase 1: collect signatures for every address
+        metrics.mark_phase('signatures')
+        print("Collecting transaction signatures...")
+        pending_addresses = [address for address in valid_addresses if address not in address_signatures]
+        for address in tqdm(pending_addresses, initial=len(valid_addresses) - len(pending_addresses), total=len(valid_addresses)):
+            try:
+                address_signatures[address] = get_recent_transactions(address)
+                journal.append({'type': 'signatures', 'address': address, 'signatures': address_signatures[address]})
+
+            except Exception as e:
+                print(f"Error processing address {address}: {str(e)}")
+                journal.sync()
+                raise e
+
+        # Phase 2: dedupe into one work set, remembering which addresses listed each signature
+        listed_by = defaultdict(list)
+        for address, signatures in address_signatures.items():
+            for tx_sig in signatures:
+                listed_by[tx_sig].append(address)
+        pending_signatures = [tx_sig for tx_sig in listed_by if tx_sig not in processed_signatures]
+        print(f"{len(listed_by)} unique transactions across {len(address_signatures)} addresses, "
+              f"{len(pending_signatures)} left to fetch")
+
+        # Phase 3: fetch each transaction once and fan it out to every address that listed it
+        metrics.mark_phase('transactions')
+        print("Analyzing transaction relationships...")
+        for tx_sig in tqdm(pending_signatures):
+            try:
+                account_keys = get_transaction_accounts(tx_sig)
+                accounts = set()
+                if account_keys:
+                    for account in account_keys:
+                        if account in registry:
+                            accounts.add(registry.id(account))
                 
-                time.sleep(0.1)
-
-         
-            if (i + 1) % SAVE_INTERVAL == 0:
-                checkpoint['processed_index'] = start_index + i + 1
-                checkpoint['address_graph'] = address_graph
-                checkpoint['interaction_count'] = interaction_count
-                checkpoint['df'] = df
-                save_checkpoint(checkpoint)
-
-        except Exception as e:
-            print(f"Error processing address {address}: {str(e)}")
-       
-            checkpoint['processed_index'] = start_index + i
-            checkpoint['address_graph'] = address_graph
-            checkpoint['interaction_count'] = interaction_count
-            checkpoint['df'] = df
-            save_checkpoint(checkpoint)
-            raise e
-
-
-    address_groups = []
-    processed_addresses = set()
-
-    for address in valid_addresses:
-        if address in processed_addresses:
-            continue
-        
-        related = set([address])
-        to_process = set([address])
-        
-        while to_process:
-            current = to_process.pop()
-            for related_address in address_graph[current]:
-                if interaction_count[(current, related_address)] >= INTERACTION_THRESHOLD:
-                    if related_address not in related:
-                        related.add(related_address)
-                        to_process.add(related_address)
-        
-        if len(related) > 1:
-            address_groups.append(related)
-            processed_addresses.update(related)
-
-
-    for index, row in df.iterrows():
-        address = row[0]
-        if pd.isna(address) or str(address).startswith('Cluster'):
-            continue
-        
-        balance = row['Balance']
-        if isinstance(balance, (int, float)):
-            if balance >= SOL_THRESHOLD:
-                df.at[index, 'Whitelist Recommendation'] = 'Yes'
-            else:
-                df.at[index, 'Whitelist Recommendation'] = 'No'
-            
-  
-            related_addresses = []
-            risk_score = 0
-            
-            for group in address_groups:
-                if address in group:
-                    related_addresses = list(group - {address})
-                    risk_score = len(group) - 1
-                    break
-            
-            df.at[index, 'Related Addresses'] = ', '.join(related_addresses) if related_addresses else 'None'
-            df.at[index, 'Risk Score'] = risk_score
-            
-     
-            if risk_score >= 2:
-                df.at[index, 'Whitelist Recommendation'] = 'No (High Risk)'
-
-
-    output_file = 'multicAIn capital DAOs_with_relationship_analysis2.xlsx'
-    df.to_excel(output_file, index=False, header=True)
-
-
-    print("\nAnalysis Summary:")
-    print(f"Total address groups found: {len(address_groups)}")
-    for i, group in enumerate(address_groups, 1):
-        print(f"\nGroup {i} (Size: {len(group)}):")
-        for addr in group:
-            balance = df.loc[df[0] == addr, 'Balance'].iloc[0]
-            print(f"  Address: {addr}, Balance: {balance:.3f} SOL")
-
-    print(f"\nResults saved to {output_file}")
-
-    if os.path.exists(CHECKPOINT_FILE):
-        os.remove(CHECKPOINT_FILE)
-    if os.path.exists(TEMP_RESULTS_FILE):
-        os.remove(TEMP_RESULTS_FILE)
+                # Same weight as walking each listing address's history separately
+                weight = len(listed_by[tx_sig])
+                with metrics.timer('graph_write_seconds'):
+                    interaction_graph.add_transaction(accounts, weight=weight)
+                processed_signatures.add(tx_sig)
+                journal.append({'type': 'transaction', 'signature': tx_sig, 'ids': sorted(accounts), 'weight': weight})
+
+            except Exception as e:
+                print(f"Error processing transaction {tx_sig}: {str(e)}")
+                journal.sync()
+                raise e
+
+    journal.sync()
+
+    if SHARD_INDEX is not None:
+        # Clustering and scoring happen once, in the merge run
+        path = partial_graph_path(SHARD_DIR, SHARD_INDEX, SHARDS)
+        save_partial_graph(path, registry, SHARD_INDEX, SHARDS, interaction_graph,
+                           {address: balances[address] for address in valid_addresses if address in balances})
+        print(f"Partial graph of shard {SHARD_INDEX} of {SHARDS} saved to {path}")
+        journal.remove()
+    else:
+        metrics.mark_phase('clustering')
+        labels, sizes = interaction_graph.components(INTERACTION_THRESHOLD)
+        address_groups = cluster_groups(registry, labels, sizes)
+
+
+        metrics.mark_phase('scoring')
+        score_addresses(df, registry, labels, sizes, SOL_THRESHOLD, gated.analyzed if gated is not None else None)
+
+
+        metrics.mark_phase('write_results')
+        output_files = write_results(df, 'multicAIn capital DAOs_with_relationship_analysis2', OUTPUT_FORMATS)
+
+
+        print("\nAnalysis Summary:")
+        print(f"Total address groups found: {len(address_groups)}")
+        for i, group in enumerate(address_groups, 1):
+            print(f"\nGroup {i} (Size: {len(group)}):")
+            for addr in group:
+                balance = registry.get_value(df, addr, 'Balance')
+                print(f"  Address: {addr}, Balance: {balance:.3f} SOL")
+
+        print(f"\nResults saved to {', '.join(output_files)}")
+
+        journal.remove()
 
 except Exception as e:
     print(f"An error occurred: {str(e)}")
-    print("Progress has been saved. You can resume later by running the script again.")
\ No newline at end of file
+    print("Progress has been saved. You can resume later by running the script again.")
+    # So run_shards.py and benchmark.py see the run as failed
+    sys.exit(1)
\ No newline at end of file
@@ -1,317 +1,374 @@
-import pandas as pd
-import aiohttp
+import numpy as np
 import asyncio
 import time
-import json
+import os
 import nest_asyncio
-from tqdm import tqdm
-from collections import defaultdict
-import itertools
-from typing import List, Dict, Set
-import random
-import pickle
+from collections import Counter
+from typing import List, Dict
 from datetime import datetime
 
+from address_registry import AddressRegistry
+from block_scan import WatchedKeys, latest_slot, scan_blocks
+from bulk_balance import fetch_balances_async
+from instrumentation import metrics
+from interaction_graph import InteractionGraph
+from cache_store import CacheStore
+from decode_pool import DECODE_WORKERS, DecodePool
+from rpc_client import AsyncRpcClient, endpoints_from_env, rpc_batch
+from rpc_scheduler import RequestScheduler
+from scoring import cluster_groups, score_addresses
+from signature_sync import sync_signatures
+from table_io import read_address_sheet, write_results
+from tx_accounts import ACCOUNT_KEYS_CONFIG
+
 
 nest_asyncio.apply()
 
 SOL_THRESHOLD = 0.5
 TRANSACTION_LIMIT = 100  
+BACKFILL_PAGES = 0  # extra pages of older history fetched per address per run
 INTERACTION_THRESHOLD = 2
-BATCH_SIZE = 1
-MAX_CONCURRENT_REQUESTS = 1
+ADDRESS_BATCH_SIZE = 50  # addresses per balance / signature work item
+BATCH_SIZE = 20  # JSON-RPC calls packed into one HTTP request
+MAX_CONCURRENT_REQUESTS = 4  # batches in flight per endpoint
 MAX_RETRIES = 5
-RETRY_DELAY = 2
-RATE_LIMIT_DELAY = 2
-WAIT_TIME = 1  
+INPUT_FILE = os.environ.get('ADDRESS_SHEET', 'multicAIn capital DAOs.xlsx')  # .xlsx, .csv or .parquet
+OUTPUT_FORMATS = ['parquet']  # add 'xlsx' for a spreadsheet copy
+
+# 'signatures': walk each address's history (getSignaturesForAddress +
+# getTransaction). 'blocks': scan the last BLOCK_SCAN_SLOTS slots with
+# getBlock instead, for watch lists too large to walk address by address.
+INGESTION_MODE = 'signatures'
+BLOCK_SCAN_SLOTS = 216_000  # about a day of slots
+USE_BLOOM_FILTER = False  # Bloom filter in front of the watched-address lookup
 
 
-RPC_ENDPOINTS = [
+# SOLANA_RPC_URL (comma-separated) overrides
+RPC_ENDPOINTS = endpoints_from_env([
     "https://api.mainnet-beta.solana.com",
     "https://solana-api.projectserum.com",
     "https://rpc.ankr.com/solana"
-]
+])
 
+# Pipeline stage sizes
+BALANCE_WORKERS = 1
+SIGNATURE_WORKERS = 2
+TRANSACTION_WORKERS = MAX_CONCURRENT_REQUESTS * len(RPC_ENDPOINTS)
+BLOCK_SCAN_WORKERS = MAX_CONCURRENT_REQUESTS * len(RPC_ENDPOINTS)
+BATCH_LINGER = 0.005  # seconds a transaction fetcher waits to fill a batch
+ADDRESS_QUEUE_SIZE = 2  # address batches waiting for the balance / signature stages
+TRANSACTION_QUEUE_SIZE = 4 * BATCH_SIZE * TRANSACTION_WORKERS
+DECODE_QUEUE_SIZE = 2 * DECODE_WORKERS  # batches waiting for a decode worker / the graph writer
 
-global url
-url = RPC_ENDPOINTS[0] 
 
-CACHE_FILE = 'solana_data_cache.pkl'
+CACHE_FILE = 'solana_data_cache.sqlite'
+LEGACY_CACHE_FILE = 'solana_data_cache.pkl'
+METRICS_FILE = 'trans_analysis_async_metrics.json'  # .json summary, any other name for Prometheus text
 
 
-try:
-    with open(CACHE_FILE, 'rb') as f:
-        cache = pickle.load(f)
-    print(f"Loaded cache with {len(cache)} entries")
-except FileNotFoundError:
-    cache = {
-        'balances': {},
-        'transactions': {},
-        'transaction_details': {}
-    }
-    print("Created new cache")
+cache = CacheStore(CACHE_FILE)
+if cache.import_pickle(LEGACY_CACHE_FILE):
+    print(f"Imported legacy cache from {LEGACY_CACHE_FILE}")
+print(f"Opened cache {CACHE_FILE}")
 
 def save_cache():
-    with open(CACHE_FILE, 'wb') as f:
-        pickle.dump(cache, f)
+    cache.commit()
     print(f"Saved cache with {len(cache['balances'])} balances, "
-          f"{len(cache['transactions'])} transaction lists, "
-          f"{len(cache['transaction_details'])} transaction details")
-
-
-# async def retry_request(session, method: str, params_list: List, batch_name: str = "") -> List:
-#     global url
-#     for attempt in range(MAX_RETRIES):
-     
-#         try:
-#             await asyncio.sleep(0.5)
-            
-#             async with session.post(url, json=[{
-#                 "jsonrpc": "2.0",
-#                 "id": i,
-#                 "method": method,
-#                 "params": params
-#             } for i, params in enumerate(params_list)]) as response:
-                
-#                 if response.status == 200:
-#                     return await response.json()
-#                 elif response.status == 429:  # Rate limit
-#                    
-#                     current_index = RPC_ENDPOINTS.index(url)
-#                     url = RPC_ENDPOINTS[(current_index + 1) % len(RPC_ENDPOINTS)]
-                    
-#                    
-#                     wait_time = WAIT_TIME + (attempt * 1)  
-#                     print(f"Rate limit hit in {batch_name}, switching to {url} and waiting {wait_time}s...")
-#                     await asyncio.sleep(wait_time)
-#                     continue
-#                 else:
-#                  
-#                     current_index = RPC_ENDPOINTS.index(url)
-#                     url = RPC_ENDPOINTS[(current_index + 1) % len(RPC_ENDPOINTS)]
-#                     print(f"Error {response.status}, switching to {url}")
-#                     await asyncio.sleep(WAIT_TIME)
-#                     continue
-                    
-#         except Exception as e:
-#             print(f"Error in {batch_name}: {str(e)}")
-#             current_index = RPC_ENDPOINTS.index(url)
-#             url = RPC_ENDPOINTS[(current_index + 1) % len(RPC_ENDPOINTS)]
-#             await asyncio.sleep(WAIT_TIME)
-#             continue
-            
-#     return []
-
-async def retry_request(session, method: str, params_list: List, batch_name: str = "") -> List:
-    global url
-    for attempt in range(MAX_RETRIES):
-        try:
-            await asyncio.sleep(0.5)
-            
-            async with session.post(url, json=[{
-                "jsonrpc": "2.0",
-                "id": i,
-                "method": method,
-                "params": params
-            } for i, params in enumerate(params_list)]) as response:
-                if response.status == 200:
-                    return await response.json()
-                elif response.status == 429:  # Rate limit
-                    wait_time = RETRY_DELAY * (attempt + 1)
-                    print(f"Rate limit hit in {batch_name}, waiting {wait_time} seconds...")
-                    await asyncio.sleep(wait_time)
-                    continue
-                else:
-                 
-                    current_index = RPC_ENDPOINTS.index(url)
-                    url = RPC_ENDPOINTS[(current_index + 1) % len(RPC_ENDPOINTS)]
-                    print(f"Switching to {url}")
-                    await asyncio.sleep(1)
-                    continue
-        except Exception as e:
-            print(f"Error in {batch_name}: {str(e)}")
-            await asyncio.sleep(1)
-            continue
-    return []
+          f"{len(cache['signatures'])} transaction lists, "
+          f"{len(cache['transaction_accounts'])} transaction details")
+
 
-async def get_balances(session, addresses: List[str]) -> Dict[str, float]:
+async def get_balances(client: AsyncRpcClient, addresses: List[str]) -> Dict[str, float]:
   
-    balances = {}
     uncached_addresses = [addr for addr in addresses if addr not in cache['balances']]
     
     if uncached_addresses:
         print(f"Fetching balances for {len(uncached_addresses)} addresses...")
+        slots = {}
+        try:
+            fetched = await fetch_balances_async(
+                lambda method, params_list: client.call_batch(
+                    method, params_list, f"{method} for {len(params_list)} keys"),
+                uncached_addresses,
+                slots=slots
+            )
+        except Exception as e:
+            print(f"Error fetching balances: {str(e)}")
+            fetched = {}
         for addr in uncached_addresses:
-            try:
-                if addr in cache['balances']:
-                    balances[addr] = cache['balances'][addr]
-                    continue
-
-                response = await retry_request(session, "getBalance", [[addr]], f"balance check for {addr}")
-                if response and len(response) > 0 and 'result' in response[0]:
-                    balance = response[0]['result']['value'] / 1_000_000_000
-                    balances[addr] = balance
-                    cache['balances'][addr] = balance
-                    print(f"Balance for {addr}: {balance} SOL")
-                else:
-                    balances[addr] = None
-                    cache['balances'][addr] = None
-                    print(f"Failed to get balance for {addr}")
-                await asyncio.sleep(random.uniform(1, 2))
-            except Exception as e:
-                print(f"Error processing balance for {addr}: {str(e)}")
-                balances[addr] = None
-                cache['balances'][addr] = None
+            if fetched.get(addr) is None:
+                print(f"Failed to get balance for {addr}")
+                continue
+            cache['balances'].set(addr, fetched[addr], slots.get(addr))
+        save_cache()
     else:
         print("Using cached balances")
-        balances = {addr: cache['balances'].get(addr) for addr in addresses}
-    
-    save_cache()
-    return balances
 
-async def get_recent_transactions(session, addresses: List[str]) -> Dict[str, List[str]]:
+    return {addr: cache['balances'].get(addr) for addr in addresses}
 
-    transactions = {}
-    uncached_addresses = [addr for addr in addresses if addr not in cache['transactions']]
+async def get_recent_transactions(scheduler: RequestScheduler, addresses: List[str]) -> Dict[str, List[str]]:
+
+    uncached_addresses = [addr for addr in addresses if addr not in cache['signatures']]
     
     if uncached_addresses:
         print(f"Fetching transactions for {len(uncached_addresses)} addresses...")
-        for addr in uncached_addresses:
-            try:
-                response = await retry_request(
-                    session,
-                    "getSignaturesForAddress",
-                    [[addr, {"limit": TRANSACTION_LIMIT}]],
-                    f"transaction check for {addr}"
-                )
-                if response and len(response) > 0 and 'result' in response[0]:
-                    transactions[addr] = response[0]['result']
-                    cache['transactions'][addr] = response[0]['result']
-                    print(f"Found {len(transactions[addr])} transactions for {addr}")
-                else:
-                    transactions[addr] = []
-                    cache['transactions'][addr] = []
-                    print(f"No transactions found for {addr}")
-                await asyncio.sleep(random.uniform(1, 2))
-            except Exception as e:
-                print(f"Error processing transactions for {addr}: {str(e)}")
-                transactions[addr] = []
-                cache['transactions'][addr] = []
+
+        async def fetch_page(params):
+            response = await scheduler.call("getSignaturesForAddress", params)
+            return response.get('result') if response else None
+
+        results = await asyncio.gather(*(
+            sync_signatures(
+                fetch_page,
+                addr,
+                cache['signatures'].peek(addr, []),
+                cache['cursors'].get(addr),
+                TRANSACTION_LIMIT,
+                BACKFILL_PAGES
+            ) for addr in uncached_addresses
+        ))
+        for addr, result in zip(uncached_addresses, results):
+            if result is not None:
+                signatures, cursor = result
+                # Newest first, so the head entry is the slot this list is current to
+                cache['signatures'].set(addr, signatures, signatures[0]['slot'] if signatures else None)
+                cache['cursors'][addr] = cursor
+                print(f"Found {len(signatures)} transactions for {addr}")
+            else:
+                print(f"Failed to get transactions for {addr}")
+        save_cache()
     else:
         print("Using cached transactions")
-        transactions = {addr: cache['transactions'].get(addr, []) for addr in addresses}
-    
-    save_cache()
-    return transactions
-
-
-async def process_transaction(session, tx_signature: str, valid_addresses: Set[str]):
-
-    if tx_signature in cache['transaction_details']:
-        return cache['transaction_details'][tx_signature]
-        
-    try:
-        await asyncio.sleep(random.uniform(0.5, 1.5))
-        response = await retry_request(
-            session,
-            "getTransaction",
-            [[tx_signature, {"encoding": "jsonParsed"}]],
-            f"tx details for {tx_signature[:8]}"
-        )
-        
-        if response and len(response) > 0 and 'result' in response[0]:
-            tx_data = response[0]['result']
-            if tx_data and 'transaction' in tx_data:
-                accounts = tx_data['transaction']['message']['accountKeys']
-                related_accounts = set()
-                for account in accounts:
-                    if account['pubkey'] in valid_addresses:
-                        related_accounts.add(account['pubkey'])
-                cache['transaction_details'][tx_signature] = related_accounts
-                save_cache()
-                return related_accounts
-        return set()
-    except Exception as e:
-        print(f"Error processing transaction {tx_signature[:8]}: {str(e)}")
-        return set()
-
-async def process_address_batch(session, addresses: List[str]):
-
-    print(f"\nProcessing batch of {len(addresses)} addresses...")
-    
 
-    balances = await get_balances(session, addresses)
+    return {addr: cache['signatures'].get(addr, []) for addr in addresses}
 
-    for addr, balance in balances.items():
-        if balance is not None:
-            df.loc[df[0] == addr, 'Balance'] = balance
 
-    transactions = await get_recent_transactions(session, addresses)
-    
-    return transactions
+async def fetch_balances_stage(client: AsyncRpcClient, balance_queue: asyncio.Queue):
+    while True:
+        addresses = await balance_queue.get()
+        try:
+            balances = await get_balances(client, addresses)
+            registry.assign(df, 'Balance', {
+                addr: balance for addr, balance in balances.items() if balance is not None
+            })
+        except Exception as e:
+            print(f"Error in balance stage: {str(e)}")
+        finally:
+            balance_queue.task_done()
+
+async def fetch_signatures_stage(scheduler: RequestScheduler, signature_queue: asyncio.Queue,
+                                 transaction_queue: asyncio.Queue, decoded_queue: asyncio.Queue,
+                                 in_flight: Dict[str, int]):
+    while True:
+        batch_num, total, addresses = await signature_queue.get()
+        try:
+            print(f"\nProcessing batch {batch_num}/{total} ({len(addresses)} addresses)")
+            transactions = await get_recent_transactions(scheduler, addresses)
+
+            # A transaction counts once for every address that listed it
+            occurrences = Counter(
+                tx['signature'] for txs in transactions.values() for tx in txs if 'signature' in tx
+            )
+            for signature, count in occurrences.items():
+                if signature in in_flight:
+                    # Already queued by another batch; fold the weight in
+                    in_flight[signature] += count
+                elif signature in cache['transaction_accounts']:
+                    # Cached pubkey ids -> this sheet's address ids
+                    address_ids = registry_ids[cache['transaction_accounts'][signature]]
+                    address_ids = address_ids[address_ids >= 0].tolist()
+                    await decoded_queue.put(([signature], [(0, None, address_ids)], count))
+                else:
+                    in_flight[signature] = count
+                    await transaction_queue.put(signature)
+        except Exception as e:
+            print(f"Error in signature stage: {str(e)}")
+        finally:
+            signature_queue.task_done()
+
+async def fetch_transactions_stage(client: AsyncRpcClient, transaction_queue: asyncio.Queue, raw_queue: asyncio.Queue):
+    # Fetcher stage: pack queued signatures into getTransaction batches and
+    # hand the undecoded bodies on
+    while True:
+        chunk = [await transaction_queue.get()]
+        try:
+            while len(chunk) < BATCH_SIZE:
+                # Give the signature stage a moment to fill the batch
+                try:
+                    chunk.append(await asyncio.wait_for(transaction_queue.get(), BATCH_LINGER))
+                except asyncio.TimeoutError:
+                    break
+            payload = rpc_batch("getTransaction", [[signature, ACCOUNT_KEYS_CONFIG] for signature in chunk])
+            body = await client.post_batch(payload, f"getTransaction for {len(chunk)} signatures", raw=True)
+            await raw_queue.put((chunk, body))
+        except Exception as e:
+            print(f"Error in transaction stage: {str(e)}")
+        finally:
+            for _ in chunk:
+                transaction_queue.task_done()
+
+async def decode_transactions_stage(decode_pool: DecodePool, raw_queue: asyncio.Queue, decoded_queue: asyncio.Queue):
+    # Decode stage: parsing runs in the process pool, this coroutine only waits
+    while True:
+        chunk, body = await raw_queue.get()
+        results = []
+        try:
+            if body:
+                with metrics.timer('decode_seconds', method="getTransaction", stage='process_pool'):
+                    results = await decode_pool.decode(body, {i: "getTransaction" for i in range(len(chunk))})
+        except Exception as e:
+            print(f"Error decoding batch of {len(chunk)} transactions: {str(e)}")
+        finally:
+            await decoded_queue.put((chunk, results, None))
+            raw_queue.task_done()
+
+async def write_interactions_stage(decoded_queue: asyncio.Queue, interaction_graph: InteractionGraph,
+                                   in_flight: Dict[str, int]):
+    # Graph-writer stage: the only code that touches the graph and the
+    # transaction cache. A weight of None marks freshly fetched results,
+    # whose weight is whatever in_flight accumulated meanwhile.
+    while True:
+        chunk, results, weight = await decoded_queue.get()
+        start = time.perf_counter()
+        try:
+            for reply_id, slot, address_ids in results:
+                if not isinstance(reply_id, int) or not 0 <= reply_id < len(chunk):
+                    continue
+                signature = chunk[reply_id]
+                if weight is not None:
+                    interaction_graph.add_transaction(address_ids, weight=weight)
+                    continue
+                interaction_graph.add_transaction(address_ids, weight=in_flight.get(signature, 1))
+                cache['transaction_accounts'].set(
+                    signature, np.sort(pubkey_ids[np.asarray(address_ids, dtype=np.int64)]), slot
+                )
+        except Exception as e:
+            print(f"Error in graph writer: {str(e)}")
+        finally:
+            if weight is None:
+                # Failed fetches are dropped too; a later listing retries them
+                for signature in chunk:
+                    in_flight.pop(signature, None)
+            metrics.observe('graph_write_seconds', time.perf_counter() - start)
+            decoded_queue.task_done()
+
+async def scan_recent_blocks(client: AsyncRpcClient, interaction_graph: InteractionGraph):
+    # Block-scan ingestion: every transaction in the window that touches a
+    # watched address goes straight into the graph
+    end_slot = await latest_slot(client)
+    if end_slot is None:
+        print("Failed to get the current slot; nothing scanned")
+        return
+    start_slot = max(0, end_slot - BLOCK_SCAN_SLOTS + 1)
+    print(f"Scanning slots {start_slot}-{end_slot} with {BLOCK_SCAN_WORKERS} workers...")
+
+    def add_transaction(signature: str, slot: int, address_ids: List[int]):
+        # Each watched account in it would have listed it, as in signature mode
+        interaction_graph.add_transaction(address_ids, weight=len(address_ids))
+
+    stats = await scan_blocks(client, start_slot, end_slot, WatchedKeys(registry.ids, USE_BLOOM_FILTER),
+                              add_transaction, BLOCK_SCAN_WORKERS)
+    print(f"Scanned {stats['blocks']} blocks, {stats['transactions']} transactions, "
+          f"{stats['matches']} touching watched addresses ({stats['skipped_slots']} skipped slots, "
+          f"{stats['failed_slots']} failed)")
 
 async def main():
     print("Starting main processing...")
     start_time = time.time()
     
  
-    valid_addresses = set()
-    current_cluster = None
-    
-    for index, row in df.iterrows():
-        address = row[0]
-        if pd.isna(address):
-            continue
-        if str(address).startswith('Cluster'):
-            current_cluster = address.strip(':')
-            print(f"\nProcessing {current_cluster}")
-            continue
-        if current_cluster and not pd.isna(address):
-            valid_addresses.add(address)
-
-    print(f"\nFound {len(valid_addresses)} valid addresses")
-
-
-    address_batches = [list(valid_addresses)[i:i + BATCH_SIZE] 
-                      for i in range(0, len(valid_addresses), BATCH_SIZE)]
+    for cluster in registry.cluster_members:
+        print(f"\nProcessing {cluster}")
+
+    print(f"\nFound {len(registry)} valid addresses")
+
+
+    address_batches = [registry.addresses[i:i + ADDRESS_BATCH_SIZE] 
+                      for i in range(0, len(registry), ADDRESS_BATCH_SIZE)]
     
     print(f"Split into {len(address_batches)} batches")
 
 
-    address_graph = defaultdict(set)
-    interaction_count = defaultdict(int)
-
-    async with aiohttp.ClientSession() as session:
-        for batch_num, batch in enumerate(address_batches, 1):
-            print(f"\nProcessing batch {batch_num}/{len(address_batches)}")
-            transactions = await process_address_batch(session, batch)
-            
-          
-            for addr, txs in transactions.items():
-                for tx in txs:
-                    if 'signature' in tx:
-                        related_accounts = await process_transaction(
-                            session, 
-                            tx['signature'], 
-                            valid_addresses
-                        )
-                        
-                        if len(related_accounts) > 1:
-                            for acc1, acc2 in itertools.combinations(related_accounts, 2):
-                                address_graph[acc1].add(acc2)
-                                address_graph[acc2].add(acc1)
-                                interaction_count[(acc1, acc2)] += 1
-                                interaction_count[(acc2, acc1)] += 1
-
+    interaction_graph = InteractionGraph(len(registry))
+    scan_blocks_mode = INGESTION_MODE == 'blocks'
+    decode_pool = None
+    if not scan_blocks_mode:
+        decode_pool = DecodePool({
+            cache.pubkeys.key(key_id): address_id for address_id, key_id in enumerate(pubkey_ids) if key_id >= 0
+        })
+
+    # address source -> balance / signature fetchers -> transaction fetchers
+    # -> decoders -> graph writer. Every stage runs at once; the bounded
+    # queues between them cap memory and push back on faster stages.
+    balance_queue = asyncio.Queue(maxsize=ADDRESS_QUEUE_SIZE)
+    signature_queue = asyncio.Queue(maxsize=ADDRESS_QUEUE_SIZE)
+    transaction_queue = asyncio.Queue(maxsize=TRANSACTION_QUEUE_SIZE)
+    raw_queue = asyncio.Queue(maxsize=DECODE_QUEUE_SIZE)
+    decoded_queue = asyncio.Queue(maxsize=DECODE_QUEUE_SIZE)
+    in_flight = {}  # signature -> weight, for transactions queued but not yet written
+
+    async with AsyncRpcClient(RPC_ENDPOINTS, MAX_RETRIES, BATCH_SIZE, MAX_CONCURRENT_REQUESTS) as client:
+        scheduler = client.scheduler()
+        stages = [
+            asyncio.ensure_future(fetch_balances_stage(client, balance_queue))
+            for _ in range(BALANCE_WORKERS)
+        ]
+        block_scan = None
+        if scan_blocks_mode:
+            # The block scan replaces the signature -> graph writer stages
+            block_scan = asyncio.ensure_future(scan_recent_blocks(client, interaction_graph))
+            stages.append(block_scan)
+        else:
+            stages += [
+                asyncio.ensure_future(fetch_signatures_stage(
+                    scheduler, signature_queue, transaction_queue, decoded_queue, in_flight))
+                for _ in range(SIGNATURE_WORKERS)
+            ] + [
+                asyncio.ensure_future(fetch_transactions_stage(client, transaction_queue, raw_queue))
+                for _ in range(TRANSACTION_WORKERS)
+            ] + [
+                asyncio.ensure_future(decode_transactions_stage(decode_pool, raw_queue, decoded_queue))
+                for _ in range(decode_pool.workers)
+            ] + [
+                asyncio.ensure_future(write_interactions_stage(decoded_queue, interaction_graph, in_flight))
+            ]
+
+        metrics.mark_phase('pipeline')
+        try:
+            for batch_num, batch in enumerate(address_batches, 1):
+                await balance_queue.put(batch)
+                if not scan_blocks_mode:
+                    await signature_queue.put((batch_num, len(address_batches), batch))
+            if block_scan is not None:
+                await block_scan
+
+            # Drain front to back: each join only returns once everything
+            # upstream of it has been handed on
+            for queue in (balance_queue, signature_queue, transaction_queue, raw_queue, decoded_queue):
+                await queue.join()
+        finally:
+            for stage in stages:
+                stage.cancel()
+            await asyncio.gather(*stages, return_exceptions=True)
+
+    metrics.mark_phase(None)
+    if decode_pool is not None:
+        decode_pool.close()
+    save_cache()
+    print(f"\nEndpoint health: {client.summary()}")
     end_time = time.time()
     print(f"\nProcessing completed in {(end_time - start_time) / 60:.2f} minutes")
-    return address_graph, interaction_count
+    return interaction_graph
+
+
+metrics.start_reporting(METRICS_FILE)
 
 try:
 
-    print("Reading Excel file...")
-    df = pd.read_excel('multicAIn capital DAOs.xlsx', header=None)
-    print(f"Successfully loaded {len(df)} rows from Excel")
+    metrics.mark_phase('load')
+    print(f"Reading {INPUT_FILE}...")
+    df = read_address_sheet(INPUT_FILE)
+    print(f"Successfully loaded {len(df)} rows")
 
 
     df['Balance'] = ''
@@ -319,69 +376,33 @@ try:
     df['Related Addresses'] = ''
     df['Risk Score'] = ''
 
+    registry = AddressRegistry.from_dataframe(df)
+    # Pubkey table id of every watched address, and the way back; the
+    # transaction cache is keyed by the former
+    pubkey_ids = cache.intern_addresses(registry.addresses)
+    registry_ids = cache.pubkeys.remap(pubkey_ids)
+
 
     print("\nStarting async processing...")
     loop = asyncio.get_event_loop()
-    address_graph, interaction_count = loop.run_until_complete(main())
+    interaction_graph = loop.run_until_complete(main())
 
 
     print("\nAnalyzing address relationships...")
-    address_groups = []
-    processed_addresses = set()
-
-    for address in df[0].dropna():
-        if address in processed_addresses or str(address).startswith('Cluster'):
-            continue
-        
-        related = set([address])
-        to_process = set([address])
-        
-        while to_process:
-            current = to_process.pop()
-            for related_address in address_graph[current]:
-                if interaction_count[(current, related_address)] >= INTERACTION_THRESHOLD:
-                    if related_address not in related:
-                        related.add(related_address)
-                        to_process.add(related_address)
-        
-        if len(related) > 1:
-            address_groups.append(related)
-            processed_addresses.update(related)
+    metrics.mark_phase('clustering')
+    labels, sizes = interaction_graph.components(INTERACTION_THRESHOLD)
+    address_groups = cluster_groups(registry, labels, sizes)
 
 
     print("\nUpdating recommendations and risk scores...")
-    for index, row in df.iterrows():
-        address = row[0]
-        if pd.isna(address) or str(address).startswith('Cluster'):
-            continue
-        
-        balance = row['Balance']
-        if isinstance(balance, (int, float)):
-            if balance >= SOL_THRESHOLD:
-                df.at[index, 'Whitelist Recommendation'] = 'Yes'
-            else:
-                df.at[index, 'Whitelist Recommendation'] = 'No'
-            
-            related_addresses = []
-            risk_score = 0
-            
-            for group in address_groups:
-                if address in group:
-                    related_addresses = list(group - {address})
-                    risk_score = len(group) - 1
-                    break
-            
-            df.at[index, 'Related Addresses'] = ', '.join(related_addresses) if related_addresses else 'None'
-            df.at[index, 'Risk Score'] = risk_score
-            
-            if risk_score >= 2:
-                df.at[index, 'Whitelist Recommendation'] = 'No (High Risk)'
+    metrics.mark_phase('scoring')
+    score_addresses(df, registry, labels, sizes, SOL_THRESHOLD)
 
 
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    output_file = f'multicAIn_capital_DAOs_analysis_{timestamp}.xlsx'
-    df.to_excel(output_file, index=False, header=True)
-    print(f"\nResults saved to {output_file}")
+    metrics.mark_phase('write_results')
+    output_files = write_results(df, f'multicAIn_capital_DAOs_analysis_{timestamp}', OUTPUT_FORMATS)
+    print(f"\nResults saved to {', '.join(output_files)}")
 
 
     print("\nAnalysis Summary:")
@@ -389,7 +410,7 @@ try:
     for i, group in enumerate(address_groups, 1):
         print(f"\nGroup {i} (Size: {len(group)}):")
         for addr in group:
-            balance = df.loc[df[0] == addr, 'Balance'].iloc[0]
+            balance = registry.get_value(df, addr, 'Balance')
             print(f"  Address: {addr}, Balance: {balance:.3f} SOL")
 
 except Exception as e:
@@ -399,5 +420,6 @@ except Exception as e:
 finally:
 
     save_cache()
+    cache.close()
 
 print("\nProgram completed!")
\ No newline at end of file
@@ -0,0 +1,109 @@
+import base64
+from typing import Dict, List, Optional, Tuple
+
+
+# getTransaction config for when only the account keys are needed. base64
+# returns the wire-format transaction as one string instead of a parsed
+# instruction tree; the keys are read straight out of the message bytes.
+ACCOUNT_KEYS_CONFIG = {
+    "encoding": "base64",
+    "maxSupportedTransactionVersion": 0
+}
+
+B58_ALPHABET = '123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz'
+B58_DIGITS = {char: digit for digit, char in enumerate(B58_ALPHABET)}
+PUBKEY_LENGTH = 32
+SIGNATURE_LENGTH = 64
+
+
+def b58encode(data: bytes) -> str:
+    number = int.from_bytes(data, 'big')
+    encoded = []
+    while number:
+        number, remainder = divmod(number, 58)
+        encoded.append(B58_ALPHABET[remainder])
+    # Each leading zero byte is written as a leading '1'
+    padding = len(data) - len(data.lstrip(b'\0'))
+    return '1' * padding + ''.join(reversed(encoded))
+
+
+def b58decode(text: str) -> bytes:
+    number = 0
+    for char in text:
+        digit = B58_DIGITS.get(char)
+        if digit is None:
+            raise ValueError(f"Invalid base58 character {char!r}")
+        number = number * 58 + digit
+    padding = len(text) - len(text.lstrip('1'))
+    return b'\0' * padding + number.to_bytes((number.bit_length() + 7) // 8, 'big')
+
+
+def _read_compact_u16(data: bytes, offset: int) -> Tuple[int, int]:
+    value = 0
+    for shift in range(3):
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7f) << (7 * shift)
+        if not byte & 0x80:
+            break
+    return value, offset
+
+
+def static_account_keys(raw_tx: bytes) -> List[bytes]:
+    # Wire format: compact-u16 signature count, signatures, then the
+    # message: optional version prefix (high bit set), 3-byte header,
+    # compact-u16 key count and the 32-byte keys themselves
+    num_signatures, offset = _read_compact_u16(raw_tx, 0)
+    offset += num_signatures * SIGNATURE_LENGTH
+    if raw_tx[offset] & 0x80:
+        offset += 1
+    offset += 3
+    num_keys, offset = _read_compact_u16(raw_tx, offset)
+    return [raw_tx[offset + i * PUBKEY_LENGTH:offset + (i + 1) * PUBKEY_LENGTH]
+            for i in range(num_keys)]
+
+
+def decode_account_keys(result: Optional[Dict]) -> Optional[List[str]]:
+    # Account keys of a getTransaction result in any of the encodings we
+    # request: static keys followed by address-lookup-table loads
+    if not result or 'transaction' not in result:
+        return None
+    transaction = result['transaction']
+
+    if isinstance(transaction, list):
+        keys = [b58encode(key) for key in static_account_keys(base64.b64decode(transaction[0]))]
+    else:
+        keys = [
+            key['pubkey'] if isinstance(key, dict) else key
+            for key in transaction['message']['accountKeys']
+        ]
+        if keys and isinstance(transaction['message']['accountKeys'][0], dict):
+            # jsonParsed already lists lookup-table addresses among the keys
+            return keys
+
+    keys.extend(_loaded_addresses(result))
+    return keys
+
+
+def decode_account_key_bytes(result: Optional[Dict]) -> Optional[List[bytes]]:
+    # Same keys as decode_account_keys, as raw 32-byte pubkeys: the static
+    # keys of a base64 reply are never converted to base58 at all
+    if not result or 'transaction' not in result:
+        return None
+    transaction = result['transaction']
+
+    if isinstance(transaction, list):
+        keys = static_account_keys(base64.b64decode(transaction[0]))
+    else:
+        account_keys = transaction['message']['accountKeys']
+        keys = [b58decode(key['pubkey'] if isinstance(key, dict) else key) for key in account_keys]
+        if account_keys and isinstance(account_keys[0], dict):
+            return keys
+
+    keys.extend(b58decode(address) for address in _loaded_addresses(result))
+    return keys
+
+
+def _loaded_addresses(result: Dict) -> List[str]:
+    loaded = (result.get('meta') or {}).get('loadedAddresses') or {}
+    return loaded.get('writable', []) + loaded.get('readonly', [])